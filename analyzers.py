@@ -0,0 +1,323 @@
+# analyzers.py
+import re
+from collections import Counter, defaultdict
+from urllib.parse import urljoin, urlparse
+
+from canonical import canonicalize_url, simhash
+
+# name -> {'name', 'func', 'requires', 'merge'}, in registration order
+ANALYZERS = {}
+
+TECH_PATTERNS = {
+    'wordpress': r'wp-content|wp-includes',
+    'react': r'react\.production\.min\.js',
+    'angular': r'angular\.min\.js',
+    'bootstrap': r'bootstrap\.min\.css',
+    'jquery': r'jquery\.min\.js'
+}
+
+SOCIAL_PATTERNS = {
+    'facebook': r'facebook.com',
+    'twitter': r'twitter.com|x.com',
+    'linkedin': r'linkedin.com',
+    'instagram': r'instagram.com',
+    'youtube': r'youtube.com'
+}
+
+SECURITY_HEADERS = ['X-Content-Type-Options', 'X-Frame-Options', 'X-XSS-Protection',
+                    'Content-Security-Policy', 'Strict-Transport-Security']
+
+# Sub-resources whose URLs are recorded for the crawl's page weight pass
+ASSET_TYPES = ('script', 'stylesheet', 'image')
+
+RESOURCE_HINTS = re.compile(r'preload|prefetch|preconnect')
+SITEMAP_LINK = re.compile(r'sitemap\.xml')
+
+
+class PageContext:
+    """Everything an analyzer may look at for one fetched page.
+
+    The soup is parsed once per page and its tags are indexed by name in a
+    single walk the first time any analyzer asks for them, so analyzers
+    share that walk instead of each calling find_all on the whole tree.
+    `results` holds the fields produced by analyzers that already ran and
+    `shared` intermediate values they leave for their dependents.
+    """
+
+    def __init__(self, url, response, body, soup, load_time, browser_timings=None, record_assets=False):
+        self.url = url
+        self.response = response
+        self.body = body
+        self.soup = soup
+        self.load_time = load_time
+        # Navigation and paint timings from the headless browser, for rendered pages
+        self.browser_timings = browser_timings
+        # Asset URL lists are only stored for crawls that measure resource weights
+        self.record_assets = record_assets
+        self.results = {}
+        self.shared = {}
+        self._tags = None
+        self._all_tags = None
+        self._text = None
+
+    def _index(self):
+        self._all_tags = self.soup.find_all(True)
+        self._tags = defaultdict(list)
+        for tag in self._all_tags:
+            self._tags[tag.name].append(tag)
+
+    def tags(self, name=None):
+        """Tags with the given name (every tag when name is None), in document order"""
+        if self._tags is None:
+            self._index()
+        return self._all_tags if name is None else self._tags.get(name, [])
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.soup.get_text()
+        return self._text
+
+
+def has_value(tag, attribute, value):
+    """BeautifulSoup attribute matching, including multi-valued attributes like rel"""
+    actual = tag.get(attribute)
+    if isinstance(actual, list):
+        return value in actual or ' '.join(actual) == value
+    return actual == value
+
+
+def register_analyzer(name, requires=(), merge=False):
+    """Register func(context) -> dict as the analyzer for a metric group.
+
+    Analyzers listed in requires always run first. Built-in analyzers merge
+    their dict into page_info; others are stored under page_info['plugins'][name].
+    """
+    def decorator(func):
+        ANALYZERS[name] = {'name': name, 'func': func, 'requires': tuple(requires), 'merge': merge}
+        return func
+    return decorator
+
+
+def resolve_analyzers(selected=None):
+    """Order the selected analyzers (all of them for None) after their dependencies"""
+    names = list(ANALYZERS) if selected is None else list(selected)
+    ordered, visiting = [], set()
+
+    def visit(name):
+        if name in ordered:
+            return
+        if name not in ANALYZERS:
+            raise ValueError(f"Unknown analyzer: {name}")
+        if name in visiting:
+            raise ValueError(f"Analyzer dependency cycle through: {name}")
+        visiting.add(name)
+        for dependency in ANALYZERS[name]['requires']:
+            visit(dependency)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return ordered
+
+
+def run_analyzers(context, names, stage=None):
+    """Run the named analyzers in order and return the page_info fields they produce.
+
+    stage, if given, is a context manager factory (e.g. PageProfiler.stage)
+    wrapped around each analyzer.
+    """
+    fields = {}
+    for name in names:
+        analyzer = ANALYZERS[name]
+        if stage is None:
+            output = analyzer['func'](context)
+        else:
+            with stage(name):
+                output = analyzer['func'](context)
+        context.results.update(output)
+        if analyzer['merge']:
+            fields.update(output)
+        else:
+            fields.setdefault('plugins', {})[name] = output
+    return fields
+
+
+@register_analyzer('links', merge=True)
+def analyze_links(context):
+    """Internal/external links and the rel=canonical target"""
+    internal_links = set()
+    external_links = set()
+    base_domain = urlparse(canonicalize_url(context.url)).netloc
+
+    for link in context.tags('a'):
+        href = link.get('href')
+        if not href:
+            continue
+        try:
+            absolute_url = canonicalize_url(urljoin(context.url, href))
+            if urlparse(absolute_url).scheme not in ('http', 'https'):
+                continue
+            if urlparse(absolute_url).netloc == base_domain:
+                internal_links.add(absolute_url)
+            else:
+                external_links.add(absolute_url)
+        except Exception:
+            continue
+
+    canonical_link = next((link for link in context.tags('link')
+                           if has_value(link, 'rel', 'canonical') and link.has_attr('href')), None)
+    canonical_url = ''
+    if canonical_link:
+        try:
+            canonical_url = canonicalize_url(urljoin(context.url, canonical_link['href']))
+        except ValueError:
+            pass  # a malformed href (e.g. a bad port) is no canonical at all
+    return {
+        'internal_links': list(internal_links),
+        'external_links': list(external_links),
+        'canonical_url': canonical_url,
+    }
+
+
+@register_analyzer('words', merge=True)
+def analyze_words(context):
+    """Word count and most frequent words"""
+    words = context.text.lower().split()
+    word_freq = Counter(words)
+    context.shared['word_freq'] = word_freq
+    return {
+        'word_count': len(words),
+        'top_words': dict(word_freq.most_common(10)),
+    }
+
+
+@register_analyzer('fingerprint', requires=['words'], merge=True)
+def analyze_fingerprint(context):
+    """SimHash of the page's word frequencies, used for near-duplicate detection"""
+    return {'content_fingerprint': format(simhash(dict(context.shared['word_freq'].most_common(500))), '016x')}
+
+
+@register_analyzer('content', merge=True)
+def analyze_content(context):
+    """Counts of page elements, meta tags, languages and text-to-HTML ratio"""
+    meta_tags = {}
+    for tag in context.tags('meta'):
+        name = tag.get('name') or tag.get('property')
+        content = tag.get('content')
+        if name and content:
+            meta_tags[name] = content
+
+    html_length = len(str(context.soup))
+    return {
+        'meta_tags': meta_tags,
+        'images_found': len(context.tags('img')),
+        'scripts': len(context.tags('script')),
+        'stylesheets': sum(1 for link in context.tags('link') if has_value(link, 'rel', 'stylesheet')),
+        'forms': len(context.tags('form')),
+        'responsive_meta': any(tag.get('name') == 'viewport' for tag in context.tags('meta')),
+        'h1_count': len(context.tags('h1')),
+        'text_to_html_ratio': round((len(context.text) / html_length) * 100, 2) if html_length > 0 else 0,
+        'languages': [tag.get('lang', 'unknown') for tag in context.tags('html') if tag.has_attr('lang')],
+    }
+
+
+@register_analyzer('social', merge=True)
+def analyze_social(context):
+    """Links to social media profiles"""
+    social_links = {}
+    for link in context.tags('a'):
+        if not link.has_attr('href'):
+            continue
+        href = link['href']
+        for platform, pattern in SOCIAL_PATTERNS.items():
+            if re.search(pattern, href, re.I):
+                social_links[platform] = href
+    return {'social_links': social_links}
+
+
+@register_analyzer('seo', merge=True)
+def analyze_seo(context):
+    """Presence of the basic on-page SEO elements"""
+    return {'seo_metrics': {
+        'meta_description': any(tag.get('name') == 'description' for tag in context.tags('meta')),
+        'canonical_url': any(has_value(tag, 'rel', 'canonical') for tag in context.tags('link')),
+        'robots_meta': any(tag.get('name') == 'robots' for tag in context.tags('meta')),
+        'sitemap_links': any(SITEMAP_LINK.search(tag.get('href') or '') for tag in context.tags('a')),
+        'has_schema': any(tag.get('type') == 'application/ld+json' for tag in context.tags()),
+    }}
+
+
+@register_analyzer('security', merge=True)
+def analyze_security(context):
+    """Which security headers the response sets"""
+    headers = context.response.headers
+    return {'security_headers': {header: headers.get(header, 'Not Set') for header in SECURITY_HEADERS}}
+
+
+def _asset_urls(context):
+    """Absolute URLs of the scripts, stylesheets and images the page loads, by type"""
+    sources = [('script', tag.get('src')) for tag in context.tags('script')]
+    sources += [('stylesheet', link.get('href')) for link in context.tags('link') if has_value(link, 'rel', 'stylesheet')]
+    sources += [('image', img.get('src')) for img in context.tags('img')]
+    assets = {kind: set() for kind in ASSET_TYPES}
+    for kind, src in sources:
+        if not src:
+            continue
+        url = urljoin(context.url, src.strip()).split('#')[0]
+        if urlparse(url).scheme in ('http', 'https'):
+            assets[kind].add(url)
+    return {kind: sorted(urls) for kind, urls in assets.items()}
+
+
+@register_analyzer('performance', merge=True)
+def analyze_performance(context):
+    """Load time and the resources the page pulls in; browser timings when the page was rendered.
+
+    With record_assets the script, stylesheet and image URLs are kept too,
+    for resource_weights to measure.
+    """
+    browser = context.browser_timings or {}
+    metrics = {
+        'total_load_time': browser.get('load') or context.load_time,
+        'script_count': len(context.tags('script')),
+        'css_count': sum(1 for link in context.tags('link') if has_value(link, 'rel', 'stylesheet')),
+        'total_links': len(context.tags('a')),
+        'resource_hints': sum(
+            1 for link in context.tags('link')
+            if any(RESOURCE_HINTS.search(value) for value in link.get('rel') or [])
+        ),
+    }
+    if browser:
+        metrics.update({
+            'dom_content_loaded': browser.get('dom_content_loaded'),
+            'first_contentful_paint': browser.get('first_contentful_paint'),
+            'largest_contentful_paint': browser.get('largest_contentful_paint'),
+        })
+    if context.record_assets:
+        return {'performance_metrics': metrics, 'assets': _asset_urls(context)}
+    return {'performance_metrics': metrics}
+
+
+@register_analyzer('accessibility', merge=True)
+def analyze_accessibility(context):
+    """Basic accessibility checks"""
+    return {'accessibility': {
+        'images_with_alt': sum(1 for img in context.tags('img') if img.get('alt')),
+        'aria_landmarks': sum(1 for tag in context.tags() if tag.has_attr('role')),
+        'form_labels': len(context.tags('label')),
+        'skip_links': any(tag.get('href') == '#main-content' for tag in context.tags('a')),
+        'language_specified': any(tag.has_attr('lang') for tag in context.tags('html')),
+    }}
+
+
+@register_analyzer('technologies', merge=True)
+def analyze_technologies(context):
+    """Frameworks and CMS detected from the markup"""
+    html = context.response.text
+    technologies = {tech: True for tech, pattern in TECH_PATTERNS.items() if re.search(pattern, html, re.I)}
+    generator = next((tag for tag in context.tags('meta') if tag.get('name') == 'generator'), None)
+    if generator is not None and generator.get('content'):
+        technologies['cms'] = generator['content']
+    return {'technologies': technologies}
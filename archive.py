@@ -0,0 +1,64 @@
+# archive.py
+import gzip
+import hashlib
+import os
+import tempfile
+
+try:
+    import zstandard
+except ImportError:  # fall back to gzip when zstd is not installed
+    zstandard = None
+
+CODEC_EXTENSIONS = {'zstd': '.zst', 'gzip': '.gz'}
+
+
+class ResponseArchive:
+    """Content-addressed store of raw response bodies on local disk.
+
+    Bodies are keyed by their SHA-256, so a body shared by many pages or
+    crawls is written once. Each blob is compressed on its own (zstd when
+    available, gzip otherwise) and sharded into subdirectories by hash
+    prefix. Which page points at which blob is recorded with the page in
+    Redis (the page's `archive` field), not here.
+    """
+
+    def __init__(self, root, level=3):
+        self.root = root
+        self.level = level
+        self.codec = 'zstd' if zstandard is not None else 'gzip'
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest, codec):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + CODEC_EXTENSIONS[codec])
+
+    def _compress(self, body):
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(body)
+        return gzip.compress(body, compresslevel=min(self.level * 2, 9))
+
+    def store(self, body, encoding=None):
+        """Archive body unless an identical one is already stored; return its index entry"""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._path(digest, self.codec)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(self._compress(body))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return {'digest': digest, 'codec': self.codec, 'size': len(body), 'encoding': encoding}
+
+    def load(self, entry):
+        """Return the original body for an index entry produced by store()"""
+        with open(self._path(entry['digest'], entry['codec']), 'rb') as f:
+            data = f.read()
+        if entry['codec'] == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed archive entries")
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=entry['size'])
+        return gzip.decompress(data)
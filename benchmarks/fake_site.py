@@ -0,0 +1,119 @@
+# benchmarks/fake_site.py
+"""Deterministic synthetic website for crawler benchmarks.
+
+Page N links to `fanout` other pages chosen from a seeded RNG, so the same
+configuration always produces the same site. Latency, 5xx errors and 429
+throttling are injected per request at configurable rates.
+"""
+import hashlib
+import multiprocessing
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONFIG = {
+    'pages': 500,
+    'fanout': 8,
+    'page_kb': 30,
+    'latency_ms': 20,
+    'error_rate': 0.0,
+    'throttle_rate': 0.0,
+    'seed': 1,
+}
+
+WORDS = ("crawler analysis page content network latency benchmark redis python "
+         "search index website performance metric result report").split()
+
+
+def _page_rng(config, page):
+    digest = hashlib.blake2b(f"{config['seed']}:{page}".encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, 'big'))
+
+
+def render_page(config, page):
+    """Build the HTML for page number `page`"""
+    rng = _page_rng(config, page)
+    links = ''.join(
+        f'<li><a href="/page/{rng.randrange(config["pages"])}">Link {i}</a></li>'
+        for i in range(config['fanout'])
+    )
+    paragraph_count = max(1, config['page_kb'] * 1024 // 600)
+    paragraphs = ''.join(
+        '<p>' + ' '.join(rng.choice(WORDS) for _ in range(80)) + '</p>'
+        for _ in range(paragraph_count)
+    )
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><title>Page {page}</title>'
+        f'<meta name="description" content="Synthetic page {page}">'
+        f'<meta name="viewport" content="width=device-width"></head><body>'
+        f'<h1>Page {page}</h1><img src="/img/{page}.png" alt="Image {page}">'
+        f'<ul>{links}</ul>{paragraphs}</body></html>'
+    ).encode('utf-8')
+
+
+def make_handler(config):
+    request_rng = random.Random(config['seed'])
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b'', content_type='text/html', headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            if config['latency_ms']:
+                time.sleep(config['latency_ms'] / 1000)
+            if self.path == '/robots.txt':
+                return self._send(200, b'User-agent: *\nAllow: /\n', 'text/plain')
+
+            roll = request_rng.random()
+            if roll < config['throttle_rate']:
+                return self._send(429, headers={'Retry-After': '1'})
+            if roll < config['throttle_rate'] + config['error_rate']:
+                return self._send(503)
+
+            if self.path == '/':
+                page = 0
+            elif self.path.startswith('/page/'):
+                try:
+                    page = int(self.path.rsplit('/', 1)[1])
+                except ValueError:
+                    return self._send(404)
+            else:
+                return self._send(404)
+            self._send(200, render_page(config, page))
+
+    return Handler
+
+
+def _serve(config, port_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(config))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_fake_site(config=None):
+    """Start the site in a separate process so its CPU time is not billed to the crawler.
+
+    Returns (base_url, process); terminate the process when done.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(config, port_queue), daemon=True)
+    process.start()
+    port = port_queue.get(timeout=10)
+    return f"http://127.0.0.1:{port}/", process
@@ -0,0 +1,333 @@
+# benchmarks/run_benchmark.py
+"""Crawl and storage benchmarks against a local synthetic site.
+
+    python benchmarks/run_benchmark.py --pages 200 --latency-ms 20
+    python benchmarks/run_benchmark.py --redis-url redis://localhost:6379/15
+    python benchmarks/run_benchmark.py --compare results/old.json results/new.json
+
+Without --redis-url the run uses fakeredis (pip install -r
+benchmarks/requirements.txt), which measures the client side only; use a
+dedicated database on a real redis-server for end-to-end numbers. Each
+suite runs in a fresh process, so its peak RSS is its own.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+from requests.models import Response  # noqa: E402
+from requests.structures import CaseInsensitiveDict  # noqa: E402
+
+from analyzers import PageContext, resolve_analyzers, run_analyzers  # noqa: E402
+from benchmarks.fake_site import DEFAULT_CONFIG, render_page, start_fake_site  # noqa: E402
+from circuit_breaker import CircuitBreaker  # noqa: E402
+from main import AdvancedWebCrawler  # noqa: E402
+from redis_storage import RedisStorage  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Metrics where a larger value is the better one; everything else is a cost
+HIGHER_IS_BETTER = {'pages_per_sec'}
+
+
+class RedisOpCounter:
+    """Count commands and network round trips issued through a redis client"""
+
+    def __init__(self, client):
+        self.commands = 0
+        self.round_trips = 0
+        execute_command = client.execute_command
+        pipeline = client.pipeline
+
+        def counted_execute_command(*args, **kwargs):
+            self.commands += 1
+            self.round_trips += 1
+            return execute_command(*args, **kwargs)
+
+        def counted_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            def counted_execute(*exec_args, **exec_kwargs):
+                self.commands += len(pipe.command_stack)
+                self.round_trips += 1
+                return execute(*exec_args, **exec_kwargs)
+
+            pipe.execute = counted_execute
+            return pipe
+
+        client.execute_command = counted_execute_command
+        client.pipeline = counted_pipeline
+
+    def reset(self):
+        self.commands = 0
+        self.round_trips = 0
+
+
+def make_redis_client(redis_url):
+    if redis_url:
+        import redis
+        client = redis.Redis.from_url(redis_url, decode_responses=True)
+        client.ping()
+        return client
+    import fakeredis
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def measure(work, pages, counter):
+    """Run work() and return throughput and cost figures normalised per page"""
+    counter.reset()
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    work()
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+    pages = max(pages(), 1) if callable(pages) else max(pages, 1)
+    return {
+        'pages': pages,
+        'wall_seconds': round(wall, 3),
+        'pages_per_sec': round(pages / wall, 2) if wall > 0 else 0,
+        'cpu_ms_per_page': round(cpu * 1000 / pages, 3),
+        'redis_commands_per_page': round(counter.commands / pages, 2),
+        'redis_round_trips_per_page': round(counter.round_trips / pages, 2),
+    }
+
+
+def bench_crawl(args, site_config, storage, counter):
+    base_url, process = start_fake_site(site_config)
+    crawler = AdvancedWebCrawler(
+        base_url, delay=args.delay, max_workers=args.workers, use_sitemaps=False,
+        circuit_breaker=CircuitBreaker(), redis_storage=storage,
+    )
+    state = {}
+    try:
+        def work():
+            # crawl() finalizes the crawl itself
+            state['crawl_id'] = crawler.crawl(max_pages=args.pages)
+        result = measure(work, lambda: len(crawler.visited_pages), counter)
+    finally:
+        process.terminate()
+        process.join()
+    result['errors'] = sum(1 for page in crawler.visited_pages if page.get('error'))
+    if not args.keep:
+        storage.delete_crawl_data(state.get('crawl_id'))
+    return result
+
+
+def synthetic_pages(site_config, count):
+    """Page dicts built by the real analyzers from the synthetic site's HTML, without any network I/O"""
+    names = resolve_analyzers()
+    headers = CaseInsensitiveDict({'Content-Type': 'text/html'})
+    pages = []
+    for number in range(count):
+        url = f"http://bench.local/page/{number}"
+        body = render_page(site_config, number)
+        response = Response()
+        response._content = body
+        response.status_code = 200
+        response.headers = headers
+        response.encoding = 'utf-8'
+        response.url = url
+        soup = BeautifulSoup(body.decode('utf-8'), 'html.parser')
+        load_time = 0.05 + (number % 20) / 100
+        page = {
+            'url': url,
+            'title': soup.title.string if soup.title else "No title",
+            'status_code': 200,
+            'load_time': load_time,
+            'content_length': len(body),
+            'headers': dict(headers),
+            'timings': {'ttfb': 0.01, 'download': 0.02, 'parse': 0.005},
+            'depth': number % 5,
+        }
+        page.update(run_analyzers(PageContext(url, response, body, soup, load_time), names))
+        pages.append(page)
+    return pages
+
+
+def bench_storage(args, site_config, storage, counter):
+    pages = synthetic_pages(site_config, args.pages)
+    crawl_id = storage.create_crawl(pages[0]['url'])
+    batch = args.flush_batch
+    results = {}
+    try:
+        def store():
+            for start in range(0, len(pages), batch):
+                storage.store_pages(crawl_id, start, pages[start:start + batch])
+        results['store_pages'] = measure(store, len(pages), counter)
+
+        def read_all():
+            for start in range(0, len(pages), 100):
+                storage.get_crawl_pages(crawl_id, start, start + 99)
+        results['get_crawl_pages'] = measure(read_all, len(pages), counter)
+
+        def read_projected():
+            for start in range(0, len(pages), 100):
+                storage.get_crawl_pages(crawl_id, start, start + 99, fields=['url', 'status_code', 'load_time'])
+        results['get_crawl_pages_projected'] = measure(read_projected, len(pages), counter)
+
+        results['get_crawl_stats'] = measure(lambda: storage.get_crawl_stats(crawl_id), len(pages), counter)
+    finally:
+        if not args.keep:
+            storage.delete_crawl_data(crawl_id)
+    return results
+
+
+def run_suite(args, site_config, suite):
+    """Run one suite in this process; returns its results and this process's peak RSS"""
+    client = make_redis_client(args.redis_url)
+    counter = RedisOpCounter(client)
+    storage = RedisStorage(redis_client=client)
+    if suite == 'storage':
+        results = bench_storage(args, site_config, storage, counter)
+    else:
+        results = {'crawl': bench_crawl(args, site_config, storage, counter)}
+    return results, peak_rss_mb()
+
+
+def run(args):
+    site_config = {
+        **DEFAULT_CONFIG,
+        'pages': args.site_pages,
+        'fanout': args.fanout,
+        'page_kb': args.page_kb,
+        'latency_ms': args.latency_ms,
+        'error_rate': args.error_rate,
+        'throttle_rate': args.throttle_rate,
+        'seed': args.seed,
+    }
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'redis': args.redis_url or 'fakeredis',
+        'site': site_config,
+        'crawler': {'pages': args.pages, 'workers': args.workers, 'delay': args.delay},
+        'results': {},
+        'peak_rss_mb': {},
+    }
+    for suite in ('storage', 'crawl'):
+        if suite not in args.suites:
+            continue
+        # A fresh interpreter per suite, so one suite's allocations never show up in the other's peak
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results, peak = executor.submit(run_suite, args, site_config, suite).result()
+        report['results'].update(results)
+        report['peak_rss_mb'][suite] = peak
+    return report
+
+
+def save_report(report, output=None):
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit']}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def compare(old_path, new_path, threshold):
+    """Print per-metric changes between two reports; return True if any regressed"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{old['commit']} -> {new['commit']}")
+    regressed = False
+    for name, new_result in new['results'].items():
+        old_result = old['results'].get(name)
+        if not old_result:
+            continue
+        print(f"\n{name}")
+        for metric, new_value in new_result.items():
+            old_value = old_result.get(metric)
+            if metric in ('pages', 'wall_seconds', 'errors') or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = '  REGRESSION' if worse > threshold else ''
+            regressed = regressed or bool(flag)
+            print(f"  {metric:28} {old_value:>10} -> {new_value:<10} {change:+.1%}{flag}")
+    old_peak, new_peak = old.get('peak_rss_mb'), new.get('peak_rss_mb') or {}
+    for suite, peak in new_peak.items():
+        # Older reports hold one process-wide peak instead of one per suite
+        before = old_peak.get(suite) if isinstance(old_peak, dict) else old_peak
+        print(f"peak_rss_mb {suite:16} {before} -> {peak}")
+    return regressed
+
+
+def print_report(report):
+    peaks = ', '.join(f"{suite} {peak} MB" for suite, peak in report['peak_rss_mb'].items())
+    print(f"commit {report['commit']} on {report['redis']}, peak RSS {peaks}")
+    for name, result in report['results'].items():
+        summary = ', '.join(f"{key}={value}" for key, value in result.items())
+        print(f"  {name}: {summary}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suites', nargs='+', choices=['crawl', 'storage'], default=['crawl', 'storage'])
+    parser.add_argument('--pages', type=int, default=200, help='pages to crawl / store')
+    parser.add_argument('--site-pages', type=int, default=DEFAULT_CONFIG['pages'])
+    parser.add_argument('--fanout', type=int, default=DEFAULT_CONFIG['fanout'])
+    parser.add_argument('--page-kb', type=int, default=DEFAULT_CONFIG['page_kb'])
+    parser.add_argument('--latency-ms', type=int, default=DEFAULT_CONFIG['latency_ms'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_CONFIG['error_rate'])
+    parser.add_argument('--throttle-rate', type=float, default=DEFAULT_CONFIG['throttle_rate'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_CONFIG['seed'])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--flush-batch', type=int, default=10)
+    parser.add_argument('--redis-url', help='real Redis to benchmark against (default: fakeredis)')
+    parser.add_argument('--output', help='where to write the JSON report')
+    parser.add_argument('--keep', action='store_true', help='keep benchmark data in Redis')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two JSON reports')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change flagged as a regression')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        return 1 if compare(*args.compare, args.threshold) else 0
+    report = run(args)
+    print_report(report)
+    print(f"saved {save_report(report, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# canonical.py
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track the visitor and never change the content
+TRACKING_PARAMS = re.compile(
+    r'^(utm_\w+|gclid|dclid|fbclid|msclkid|yclid|mc_cid|mc_eid|_ga|_gl|igshid|ref_src|sessionid|phpsessid|jsessionid)$',
+    re.I
+)
+
+
+def canonicalize_url(url):
+    """Normalize a URL so trivially different spellings of the same page compare equal.
+
+    Lower-cases scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the remaining query parameters and strips trailing
+    slashes from non-root paths.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # hostname drops the brackets of an IPv6 literal
+    port = parts.port
+    netloc = host
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{host}"
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+
+    path = re.sub(r'/{2,}', '/', parts.path) or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def simhash(weighted_features, bits=64):
+    """Compute a SimHash fingerprint from a {feature: weight} mapping"""
+    vector = [0] * bits
+    for feature, weight in weighted_features.items():
+        digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(bits):
+            vector[bit] += weight if digest >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(bits) if vector[bit] > 0)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """Find previously seen fingerprints within a small Hamming distance.
+
+    The 64-bit fingerprint is split into max_distance + 1 bands; by the
+    pigeonhole principle two fingerprints within max_distance bits share at
+    least one identical band, so only that bucket has to be scanned.
+    """
+
+    def __init__(self, max_distance=3, bits=64):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = bits // self.bands
+        self._buckets = {}
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(band, fingerprint >> (band * self.band_bits) & mask) for band in range(self.bands)]
+
+    def find(self, fingerprint):
+        """Return the key of a near-duplicate fingerprint, or None"""
+        for band_key in self._band_keys(fingerprint):
+            for other, key in self._buckets.get(band_key, ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint, key):
+        for band_key in self._band_keys(fingerprint):
+            self._buckets.setdefault(band_key, []).append((fingerprint, key))
@@ -0,0 +1,132 @@
+# circuit_breaker.py
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Failure classes recorded in page_info['error']['type']
+DNS_FAILURE = 'dns'
+CONNECT_REFUSED = 'connect_refused'
+TLS_ERROR = 'tls'
+TIMEOUT = 'timeout'
+SERVER_ERROR = 'http_5xx'
+CONNECTION_ERROR = 'connection'
+CIRCUIT_OPEN = 'circuit_open'
+PARSE_ERROR = 'parse'
+OTHER = 'other'
+
+# Failures that will not go away by retrying within the same crawl
+NON_RETRYABLE = {DNS_FAILURE, TLS_ERROR, CIRCUIT_OPEN}
+
+
+def _exception_chain(exc):
+    """Walk an exception and everything it wraps (causes, contexts, urllib3 reasons)"""
+    pending, seen = [exc], set()
+    while pending:
+        current = pending.pop()
+        if not isinstance(current, BaseException) or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        pending.extend([current.__cause__, current.__context__, getattr(current, 'reason', None)])
+        pending.extend(current.args)
+
+
+def classify_failure(exc=None, status_code=None):
+    """Map a request exception or HTTP status to one of the failure classes"""
+    if exc is None:
+        return SERVER_ERROR if status_code and status_code >= 500 else OTHER
+
+    if isinstance(exc, requests.exceptions.SSLError):
+        return TLS_ERROR
+    if isinstance(exc, requests.exceptions.Timeout):
+        return TIMEOUT
+
+    for cause in _exception_chain(exc):
+        if isinstance(cause, socket.gaierror) or type(cause).__name__ == 'NameResolutionError':
+            return DNS_FAILURE
+        if isinstance(cause, ConnectionRefusedError):
+            return CONNECT_REFUSED
+        if isinstance(cause, ssl.SSLError):
+            return TLS_ERROR
+        if isinstance(cause, (socket.timeout, TimeoutError)):
+            return TIMEOUT
+        # urllib3 wraps resolver errors in its own messages
+        if 'Name or service not known' in str(cause) or 'getaddrinfo failed' in str(cause):
+            return DNS_FAILURE
+
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return CONNECTION_ERROR
+    return OTHER
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker: fast-fail requests to hosts that keep failing.
+
+    A host's circuit opens after failure_threshold consecutive failures (DNS
+    failures open it immediately). While open, requests are refused until
+    reset_timeout has passed; then a single half-open probe is let through,
+    and its outcome closes the circuit again or re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, url):
+        host = urlparse(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                'state': self.CLOSED, 'failures': 0, 'opened_at': 0.0,
+                'probing': False, 'last_failure': None,
+            }
+        return state
+
+    def allow(self, url):
+        """Return True if a request to url's host may be attempted now"""
+        with self._lock:
+            state = self._host_state(url)
+            if state['state'] == self.CLOSED:
+                return True
+            if state['state'] == self.OPEN and time.monotonic() - state['opened_at'] >= self.reset_timeout:
+                state['state'] = self.HALF_OPEN
+                state['probing'] = False
+            if state['state'] == self.HALF_OPEN and not state['probing']:
+                state['probing'] = True
+                return True
+            return False
+
+    def record_success(self, url):
+        with self._lock:
+            state = self._host_state(url)
+            state.update(state=self.CLOSED, failures=0, probing=False)
+
+    def record_failure(self, url, failure_type):
+        with self._lock:
+            state = self._host_state(url)
+            state['failures'] += 1
+            state['last_failure'] = failure_type
+            if (state['state'] == self.HALF_OPEN or failure_type == DNS_FAILURE
+                    or state['failures'] >= self.failure_threshold):
+                state.update(state=self.OPEN, opened_at=time.monotonic(), probing=False)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                host: {'state': state['state'], 'failures': state['failures'], 'last_failure': state['last_failure']}
+                for host, state in self._hosts.items()
+            }
+
+
+# Shared by every crawler in the process, so one crawl's dead host fast-fails the next
+shared_breaker = CircuitBreaker()
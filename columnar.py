@@ -0,0 +1,280 @@
+# columnar.py
+"""Columnar on-disk export of crawl results for cross-crawl analytics.
+
+    python columnar.py export --root exports
+    python columnar.py compact --root exports --month 2026-10
+    python columnar.py percentile --root exports --column load_time --q 95 --since 2026-10-01
+
+Each exported crawl becomes a segment directory under <root>/<YYYY-MM>/ with
+one .npy file per numeric column plus the URLs as offsets into a UTF-8
+buffer. Reads memory-map the arrays, so slicing out a crawl or a domain
+copies nothing. Compaction merges a month's segments into one so queries
+open a handful of files no matter how many crawls there were.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import numpy as np
+
+from redis_storage import RedisStorage
+
+NUMERIC_COLUMNS = {
+    'load_time': np.float32,
+    'content_length': np.int64,
+    'word_count': np.int32,
+    'status_code': np.int16,
+    'depth': np.int16,
+}
+SEGMENT_META = 'meta.json'
+COMPACTED_PREFIX = 'compacted-'
+
+
+def _write_segment(path, columns, urls, crawls, replaces=()):
+    """Write a segment to a temporary directory, then move it into place"""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+    encoded = [url.encode('utf-8') for url in urls]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(url) for url in encoded], out=offsets[1:])
+    np.save(os.path.join(tmp_path, 'url_offsets.npy'), offsets)
+    np.save(os.path.join(tmp_path, 'url_bytes.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    with open(os.path.join(tmp_path, SEGMENT_META), 'w') as f:
+        json.dump({'crawls': crawls, 'rows': len(urls), 'replaces': sorted(replaces)}, f)
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """A memory-mapped segment: numeric columns plus per-crawl row ranges"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, SEGMENT_META)) as f:
+            meta = json.load(f)
+        self.crawls = meta['crawls']
+        self.rows = meta['rows']
+        # Names of the segments a compaction merged into this one
+        self.replaces = meta.get('replaces', [])
+        self._columns = {}
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+        return self._columns[name]
+
+    def urls(self, start=0, end=None):
+        offsets = self.column('url_offsets')
+        data = self.column('url_bytes')
+        end = self.rows if end is None else end
+        return [bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in range(start, end)]
+
+
+def segment_name(crawl_id):
+    return 'seg-' + hashlib.sha1(crawl_id.encode('utf-8')).hexdigest()[:16]
+
+
+def export_crawl(redis_storage, crawl_id, root, chunk_size=1000):
+    """Export one crawl as a segment; returns its path, or None if already exported or empty"""
+    summary = redis_storage.get_crawl_summary(crawl_id)
+    if not summary:
+        return None
+    month_dir = os.path.join(root, summary['crawl_time'][:7])
+    path = os.path.join(month_dir, segment_name(crawl_id))
+    if os.path.exists(path) or _in_compacted(month_dir, crawl_id):
+        return None
+
+    fields = ['url', *NUMERIC_COLUMNS]
+    total = redis_storage.count_pages(crawl_id)
+    columns = {name: np.empty(total, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+    urls = []
+    for start in range(0, total, chunk_size):
+        pages = redis_storage.get_crawl_pages(crawl_id, start, start + chunk_size - 1, fields=fields)
+        for offset, page in enumerate(pages, start):
+            for name in NUMERIC_COLUMNS:
+                columns[name][offset] = page.get(name, 0)
+            urls.append(page.get('url', ''))
+    rows = len(urls)
+    if not rows:
+        return None
+
+    os.makedirs(month_dir, exist_ok=True)
+    _write_segment(path, {name: values[:rows] for name, values in columns.items()}, urls, [{
+        'crawl_id': crawl_id,
+        'domain': urlparse(summary.get('start_url', '')).netloc,
+        'crawl_time': summary['crawl_time'],
+        'start': 0,
+        'end': rows,
+    }])
+    return path
+
+
+def export_crawls(redis_storage, root):
+    """Export every completed crawl that is not exported yet"""
+    exported = []
+    for crawl_id in redis_storage.redis_client.lrange('all_crawls', 0, -1):
+        summary = redis_storage.get_crawl_summary(crawl_id)
+        if summary and summary.get('status', 'completed') == 'completed':
+            path = export_crawl(redis_storage, crawl_id, root)
+            if path:
+                exported.append(path)
+    return exported
+
+
+def _month_segments(month_dir):
+    """All finished segment names of a month, and those a compaction has already merged"""
+    if not os.path.isdir(month_dir):
+        return [], set()
+    names = sorted(
+        name for name in os.listdir(month_dir)
+        if (name.startswith('seg-') or name.startswith(COMPACTED_PREFIX)) and not name.endswith('.tmp')
+    )
+    merged = set()
+    for name in names:
+        if name.startswith(COMPACTED_PREFIX):
+            merged.update(Segment(os.path.join(month_dir, name)).replaces)
+    return names, merged
+
+
+def _segment_dirs(month_dir):
+    """Segments to read; merged ones a compaction did not get to delete are skipped"""
+    names, merged = _month_segments(month_dir)
+    return [os.path.join(month_dir, name) for name in names if name not in merged]
+
+
+def _in_compacted(month_dir, crawl_id):
+    for path in _segment_dirs(month_dir):
+        if os.path.basename(path).startswith(COMPACTED_PREFIX):
+            if any(crawl['crawl_id'] == crawl_id for crawl in Segment(path).crawls):
+                return True
+    return False
+
+
+def compact_month(root, month):
+    """Merge all segments of a month (including earlier compactions) into one segment"""
+    month_dir = os.path.join(root, month)
+    names, merged = _month_segments(month_dir)
+    paths = [os.path.join(month_dir, name) for name in names if name not in merged]
+    if len(paths) < 2:
+        return None
+
+    segments = [Segment(path) for path in paths]
+    columns = {name: np.concatenate([segment.column(name) for segment in segments]) for name in NUMERIC_COLUMNS}
+    urls, crawls, base = [], [], 0
+    for segment in segments:
+        urls.extend(segment.urls())
+        crawls.extend({**crawl, 'start': crawl['start'] + base, 'end': crawl['end'] + base}
+                      for crawl in segment.crawls)
+        base += segment.rows
+
+    # The new segment lists every segment it supersedes, including leftovers of an interrupted
+    # compaction, so a crash before the deletes below never makes queries count pages twice
+    path = os.path.join(month_dir, f"{COMPACTED_PREFIX}{int(time.time() * 1000)}")
+    _write_segment(path, columns, urls, crawls, replaces=names)
+    for name in names:
+        shutil.rmtree(os.path.join(month_dir, name), ignore_errors=True)
+    return path
+
+
+class ColumnarStore:
+    """Query exported crawls across segments and months"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _months(self, since, until):
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            month for month in sorted(os.listdir(self.root))
+            if len(month) == 7 and (since is None or month >= since[:7]) and (until is None or month <= until[:7])
+        ]
+
+    def slices(self, domain=None, since=None, until=None):
+        """Yield (segment, crawl, start, end) for crawls matching the filters"""
+        since = since.isoformat() if isinstance(since, datetime) else since
+        until = until.isoformat() if isinstance(until, datetime) else until
+        if until and len(until) == 10:
+            # A bare date includes the whole day
+            until += 'T23:59:59.999999'
+        for month in self._months(since, until):
+            for path in _segment_dirs(os.path.join(self.root, month)):
+                segment = Segment(path)
+                for crawl in segment.crawls:
+                    if domain is not None and crawl['domain'] != domain:
+                        continue
+                    if (since and crawl['crawl_time'] < since) or (until and crawl['crawl_time'] > until):
+                        continue
+                    yield segment, crawl, crawl['start'], crawl['end']
+
+    def column(self, name, domain=None, since=None, until=None, ok_only=True):
+        """All values of a numeric column for the matching crawls, as one array"""
+        parts = []
+        for segment, _, start, end in self.slices(domain, since, until):
+            values = segment.column(name)[start:end]
+            if ok_only:
+                status = segment.column('status_code')[start:end]
+                values = values[(status >= 200) & (status < 400)]
+            parts.append(values)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=NUMERIC_COLUMNS[name])
+
+    def percentile(self, name, q, domain=None, since=None, until=None):
+        values = self.column(name, domain, since, until)
+        return float(np.percentile(values, q)) if len(values) else None
+
+    def percentiles_by_domain(self, name, q, since=None, until=None):
+        """{domain: qth percentile of the column} over the matching crawls"""
+        by_domain = {}
+        for segment, crawl, start, end in self.slices(since=since, until=until):
+            values = segment.column(name)[start:end]
+            status = segment.column('status_code')[start:end]
+            by_domain.setdefault(crawl['domain'], []).append(values[(status >= 200) & (status < 400)])
+        return {
+            domain: float(np.percentile(np.concatenate(parts), q))
+            for domain, parts in sorted(by_domain.items())
+            if sum(len(part) for part in parts)
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['export', 'compact', 'percentile'])
+    parser.add_argument('--root', default=os.getenv('COLUMNAR_DIR', 'exports'))
+    parser.add_argument('--month', help='YYYY-MM to compact (default: every month)')
+    parser.add_argument('--column', default='load_time', choices=sorted(NUMERIC_COLUMNS))
+    parser.add_argument('--q', type=float, default=95)
+    parser.add_argument('--domain')
+    parser.add_argument('--since', help='ISO date or datetime')
+    parser.add_argument('--until', help='ISO date or datetime')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        exported = export_crawls(RedisStorage(), args.root)
+        print(f"Exported {len(exported)} crawls to {args.root}")
+    elif args.command == 'compact':
+        months = [args.month] if args.month else ColumnarStore(args.root)._months(None, None)
+        for month in months:
+            path = compact_month(args.root, month)
+            print(f"{month}: {'compacted into ' + path if path else 'nothing to compact'}")
+    else:
+        store = ColumnarStore(args.root)
+        start = time.perf_counter()
+        if args.domain:
+            results = {args.domain: store.percentile(args.column, args.q, args.domain, args.since, args.until)}
+        else:
+            results = store.percentiles_by_domain(args.column, args.q, args.since, args.until)
+        elapsed = (time.perf_counter() - start) * 1000
+        for domain, value in results.items():
+            print(f"{domain}\t{value}")
+        print(f"p{args.q:g} {args.column} over {len(results)} domains in {elapsed:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# crawl_diff.py
+import numpy as np
+
+# Stored page fields the comparison needs
+DIFF_FIELDS = ['url', 'status_code', 'load_time', 'images_found',
+               'seo_metrics', 'accessibility', 'security_headers']
+
+FLAG_GROUPS = ['seo_metrics', 'accessibility', 'security_headers']
+
+
+def _page_flags(page, group):
+    """The yes/no checks of one metric group for a page; empty when the group was not analyzed"""
+    values = page.get(group) or {}
+    if group == 'security_headers':
+        return {header: value != 'Not Set' for header, value in values.items()}
+    flags = {name: value for name, value in values.items() if isinstance(value, bool)}
+    if group == 'accessibility' and 'images_with_alt' in values:
+        flags['all_images_have_alt'] = values['images_with_alt'] >= page.get('images_found', 0)
+    return flags
+
+
+class CrawlFrame:
+    """One crawl's pages as column arrays, one row per unique URL, sorted by URL"""
+
+    def __init__(self, crawl_id, summary, pages):
+        self.crawl_id = crawl_id
+        self.summary = summary
+        urls = np.array([page.get('url', '') for page in pages], dtype=str)
+        # np.unique sorts; keep the first occurrence of any repeated URL
+        self.urls, first = np.unique(urls, return_index=True)
+        self._pages = [pages[i] for i in first]
+        self.status = np.array([page.get('status_code', 0) for page in self._pages], dtype=np.int16)
+        self.load_time = np.array([page.get('load_time', 0) for page in self._pages], dtype=np.float32)
+
+    def flag_rows(self, group, index):
+        """The group's flags for the pages at index (an array of row numbers)"""
+        return [_page_flags(self._pages[i], group) for i in index.tolist()]
+
+
+def _flag_matrix(rows, names):
+    """(known, matrix): whether each row has the group at all, and a rows x names boolean matrix"""
+    known = np.fromiter((bool(row) for row in rows), dtype=bool, count=len(rows))
+    matrix = np.zeros((len(rows), len(names)), dtype=bool)
+    for column, name in enumerate(names):
+        matrix[:, column] = np.fromiter((row.get(name, False) for row in rows), dtype=bool, count=len(rows))
+    return known, matrix
+
+
+def load_frame(redis_storage, crawl_id, chunk_size=5000):
+    """Fetch the fields needed for comparison and build a CrawlFrame"""
+    summary = redis_storage.get_crawl_summary(crawl_id)
+    if not summary:
+        raise LookupError(f"Crawl not found: {crawl_id}")
+    pages = []
+    total = redis_storage.count_pages(crawl_id)
+    for start in range(0, total, chunk_size):
+        pages.extend(redis_storage.get_crawl_pages(crawl_id, start, start + chunk_size - 1, fields=DIFF_FIELDS))
+    return CrawlFrame(crawl_id, summary, pages)
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+
+def compare_frames(base, target, load_time_ratio=1.5, load_time_min_delta=0.25, limit=100):
+    """Diff two crawls of the same site; lists are capped at limit entries"""
+    common, base_index, target_index = np.intersect1d(
+        base.urls, target.urls, assume_unique=True, return_indices=True)
+    added = target.urls[~np.isin(target.urls, base.urls, assume_unique=True)]
+    removed = base.urls[~np.isin(base.urls, target.urls, assume_unique=True)]
+
+    base_status = base.status[base_index]
+    target_status = target.status[target_index]
+    status_changed = np.flatnonzero(base_status != target_status)
+
+    ok = ((base_status >= 200) & (base_status < 400)) & ((target_status >= 200) & (target_status < 400))
+    base_load = base.load_time[base_index]
+    target_load = target.load_time[target_index]
+    delta = target_load - base_load
+    regressed = np.flatnonzero(ok & (target_load > base_load * load_time_ratio) & (delta > load_time_min_delta))
+    regressed = regressed[np.argsort(-delta[regressed], kind='stable')]
+
+    result = {
+        'base': base.crawl_id,
+        'target': target.crawl_id,
+        'pages': {'base': len(base.urls), 'target': len(target.urls), 'common': len(common)},
+        'added': {'count': len(added), 'urls': added[:limit].tolist()},
+        'removed': {'count': len(removed), 'urls': removed[:limit].tolist()},
+        'status_changes': {
+            'count': len(status_changed),
+            'pages': [
+                {'url': common[i], 'from': int(base_status[i]), 'to': int(target_status[i])}
+                for i in status_changed[:limit].tolist()
+            ],
+        },
+        'load_time': {
+            'base_p50': _percentile(base_load[ok], 50),
+            'target_p50': _percentile(target_load[ok], 50),
+            'base_p95': _percentile(base_load[ok], 95),
+            'target_p95': _percentile(target_load[ok], 95),
+            'regressions': len(regressed),
+            'pages': [
+                {'url': common[i], 'from': round(float(base_load[i]), 3), 'to': round(float(target_load[i]), 3)}
+                for i in regressed[:limit].tolist()
+            ],
+        },
+    }
+
+    for group in FLAG_GROUPS:
+        # Flags only matter for pages present in both crawls
+        base_rows = base.flag_rows(group, base_index)
+        target_rows = target.flag_rows(group, target_index)
+        names = sorted(set().union(*base_rows, *target_rows))
+        base_known, base_flags = _flag_matrix(base_rows, names)
+        target_known, target_flags = _flag_matrix(target_rows, names)
+        # Only pages analyzed for this group in both crawls can be compared
+        rows = np.flatnonzero(base_known & target_known)
+        before = base_flags[rows]
+        after = target_flags[rows]
+        lost = before & ~after
+        gained = ~before & after
+        lost_rows = np.flatnonzero(lost.any(axis=1))
+        result[group] = {
+            'compared': len(rows),
+            'checks': {
+                name: {'gained': int(gained[:, column].sum()), 'lost': int(lost[:, column].sum())}
+                for column, name in enumerate(names)
+                if gained[:, column].any() or lost[:, column].any()
+            },
+            'regressions': len(lost_rows),
+            'pages': [
+                {'url': common[rows[i]], 'lost': [name for name, gone in zip(names, lost[i]) if gone]}
+                for i in lost_rows[:limit].tolist()
+            ],
+        }
+    return result
+
+
+def compare_crawls(redis_storage, crawl_ids, limit=100, **thresholds):
+    """Diff each crawl against the one before it, in crawl-time order.
+
+    All crawls must share the same start_url.
+    """
+    if len(crawl_ids) < 2:
+        raise ValueError("At least two crawls are needed for a comparison")
+    frames = sorted((load_frame(redis_storage, crawl_id) for crawl_id in crawl_ids),
+                    key=lambda frame: frame.summary.get('crawl_time', ''))
+    start_urls = {frame.summary.get('start_url', '').rstrip('/') for frame in frames}
+    if len(start_urls) > 1:
+        raise ValueError(f"Crawls have different start URLs: {', '.join(sorted(start_urls))}")
+
+    return {
+        'start_url': frames[0].summary.get('start_url', ''),
+        'crawls': [
+            {'crawl_id': frame.crawl_id, 'crawl_time': frame.summary.get('crawl_time'), 'pages': len(frame.urls)}
+            for frame in frames
+        ],
+        'comparisons': [
+            compare_frames(base, target, limit=limit, **thresholds)
+            for base, target in zip(frames, frames[1:])
+        ],
+    }
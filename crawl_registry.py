@@ -0,0 +1,110 @@
+# crawl_registry.py
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from canonical import canonicalize_url
+
+PENDING_PREFIX = 'pending:'
+
+
+class InFlightCrawls:
+    """Registry of running crawls in Redis, so identical submissions share one crawl.
+
+    A submission claims the key of its (normalized URL, parameters) with
+    SET NX and a lease; later submitters of the same crawl read the crawl ID
+    from the key and attach to it instead of starting their own. The owner
+    renews the lease while it crawls and deletes the key when done, so a
+    crashed owner only blocks the key until its lease runs out.
+    """
+
+    def __init__(self, redis_client, lease=60, poll_interval=0.5):
+        self.redis_client = redis_client
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+    def key(self, url, **params):
+        """Key for a crawl: the canonical start URL plus the parameters that shape its result"""
+        identity = json.dumps({'url': canonicalize_url(url), **params}, sort_keys=True, default=str)
+        return "inflight:" + hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def crawl_key(self, crawl_id):
+        """Key held for as long as crawl_id is being crawled, whoever started or resumed it"""
+        return "inflight:crawl:" + crawl_id
+
+    def lock_crawl(self, crawl_id):
+        """Mark crawl_id as being crawled by the caller; False if it already is, here or elsewhere.
+
+        The caller keeps the lock with hold(crawl_key(crawl_id), crawl_id).
+        """
+        return bool(self.redis_client.set(self.crawl_key(crawl_id), crawl_id, nx=True, ex=self.lease))
+
+    def claim(self, key):
+        """Return (token, None) if the caller now owns the crawl, else (None, running crawl ID or None).
+
+        The owner must call assign() with the crawl ID once it has one.
+        """
+        token = PENDING_PREFIX + uuid.uuid4().hex
+        if self.redis_client.set(key, token, nx=True, ex=self.lease):
+            return token, None
+        return None, self.running_crawl(key)
+
+    def running_crawl(self, key, timeout=10):
+        """The crawl ID registered under key, waiting briefly while its owner is still registering it"""
+        deadline = time.monotonic() + timeout
+        while True:
+            value = self.redis_client.get(key)
+            if value is None or not value.startswith(PENDING_PREFIX):
+                return value
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval / 5)
+
+    def _swap(self, key, expected, value):
+        """Replace the key's value (or delete it when value is None) only if it still holds expected"""
+        with self.redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) != expected:
+                    return False
+                pipe.multi()
+                if value is None:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, value, ex=self.lease)
+                pipe.execute()
+                return True
+            except Exception:
+                return False
+
+    def assign(self, key, token, crawl_id):
+        return self._swap(key, token, crawl_id)
+
+    def release(self, key, crawl_id):
+        return self._swap(key, crawl_id, None)
+
+    def hold(self, key, crawl_id):
+        """Renew the lease on a background thread until the returned function is called to release it"""
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease / 3):
+                self._swap(key, crawl_id, crawl_id)
+
+        threading.Thread(target=renew, name="inflight-lease", daemon=True).start()
+
+        def release():
+            done.set()
+            self.release(key, crawl_id)
+        return release
+
+    def wait_finished(self, key, crawl_id, timeout):
+        """Block until crawl_id no longer holds key (finished, failed or its lease ran out)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.redis_client.get(key) != crawl_id:
+                return True
+            time.sleep(self.poll_interval)
+        return False
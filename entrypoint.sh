@@ -1,4 +1,8 @@
 #!/bin/bash
 set -e
 
-exec python website.py
\ No newline at end of file
+# SERVER_MODE=development runs Flask's debug server with the reloader
+if [ "${SERVER_MODE:-production}" = "development" ]; then
+    exec python website.py
+fi
+exec gunicorn -c gunicorn.conf.py website:app
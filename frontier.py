@@ -0,0 +1,90 @@
+# frontier.py
+import heapq
+import itertools
+import re
+from urllib.parse import urlparse
+
+# Small nudges away from URL shapes that rarely carry unique content
+DEFAULT_URL_WEIGHTS = {
+    r'/(tag|tags|author)/': -1.0,
+    r'/page/\d+': -0.5,
+    r'[?&](sort|order|filter)=': -1.0,
+    r'/(login|signin|register|cart|checkout)': -2.0,
+}
+
+
+def default_score(url, depth, in_degree, hint, url_weights):
+    """Score a queued URL: more inbound links and higher sitemap priority rank first"""
+    score = in_degree + (hint or 0) * 2
+    for pattern, weight in url_weights:
+        if pattern.search(url):
+            score += weight
+    return score
+
+
+class Frontier:
+    """Priority queue of URLs to crawl, ordered by depth (BFS) and then by score.
+
+    A URL seen again while still queued gains in-degree and is re-pushed with
+    its new score; the outdated heap entry is skipped lazily on pop, so every
+    operation stays O(log n).
+    """
+
+    def __init__(self, max_depth=None, path_budgets=None, score_fn=None, url_weights=None):
+        self.max_depth = max_depth
+        self.path_budgets = dict(path_budgets or {})
+        self.score_fn = score_fn or default_score
+        self.url_weights = [
+            (re.compile(pattern, re.I), weight)
+            for pattern, weight in (DEFAULT_URL_WEIGHTS if url_weights is None else url_weights).items()
+        ]
+        self._heap = []
+        self._entries = {}  # url -> [depth, in_degree, hint, version]
+        self._counter = itertools.count()
+        self._budget_used = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, url, depth, hint=None):
+        """Queue url at depth, or strengthen it if it is already queued"""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = self._entries[url] = [depth, 1, hint, 0]
+        else:
+            entry[0] = min(entry[0], depth)
+            entry[1] += 1
+            if hint is not None:
+                entry[2] = max(hint, entry[2] or 0)
+            entry[3] += 1
+        score = self.score_fn(url, entry[0], entry[1], entry[2], self.url_weights)
+        heapq.heappush(self._heap, (entry[0], -score, next(self._counter), entry[3], url))
+        return True
+
+    def _budget_prefix(self, url):
+        path = urlparse(url).path or '/'
+        matches = [prefix for prefix in self.path_budgets if path.startswith(prefix)]
+        return max(matches, key=len) if matches else None
+
+    def pop(self):
+        """Return the best (url, depth) pair, or None when nothing is left"""
+        while self._heap:
+            depth, _, _, version, url = heapq.heappop(self._heap)
+            entry = self._entries.get(url)
+            if entry is None or entry[3] != version:
+                continue  # stale entry superseded by a later push
+            del self._entries[url]
+
+            prefix = self._budget_prefix(url)
+            if prefix is not None:
+                if self._budget_used.get(prefix, 0) >= self.path_budgets[prefix]:
+                    continue
+                self._budget_used[prefix] = self._budget_used.get(prefix, 0) + 1
+            return url, depth
+        return None
+
+    def snapshot(self):
+        """Serializable [url, depth, hint] entries for checkpointing"""
+        return [[url, entry[0], entry[2]] for url, entry in self._entries.items()]
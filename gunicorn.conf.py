@@ -0,0 +1,56 @@
+# gunicorn.conf.py
+"""Production serving settings: gunicorn -c gunicorn.conf.py website:app
+
+Threaded workers, because progress streams (server-sent events) and
+synchronous /crawl requests hold a connection, and its thread, for a long
+time; progress streams are capped per worker (MAX_PROGRESS_STREAMS). On
+SIGTERM each worker stops accepting requests, finishes the ones in
+flight, then waits for its background crawl jobs. Crawls still running
+CHECKPOINT_GRACE seconds before graceful_timeout runs out (counted from
+SIGTERM), background jobs and synchronous /crawl requests alike, are
+stopped at a checkpoint so they can be resumed elsewhere.
+"""
+import multiprocessing
+import os
+import signal
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+# Longer than the proxy's idle timeout (Traefik: 90s), so the proxy always closes idle connections first
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 95))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 300))
+# Import the app once in the master; workers fork from it and connect to Redis themselves
+preload_app = True
+accesslog = '-'
+errorlog = '-'
+
+# Seconds kept back from graceful_timeout for stopped crawl jobs to write their checkpoint
+CHECKPOINT_GRACE = 30
+
+
+def post_worker_init(worker):
+    import website
+    website.start()
+
+    # Mark the worker as draining as soon as SIGTERM arrives, so progress
+    # streams end and /api/crawl turns new jobs away while requests finish.
+    # The arbiter kills the worker graceful_timeout after SIGTERM, so the
+    # deadline for stopping crawls at a checkpoint is counted from here.
+    handle_exit = worker.handle_exit
+
+    def on_sigterm(sig, frame):
+        website.begin_drain(max(worker.cfg.graceful_timeout - CHECKPOINT_GRACE, 0))
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+def worker_exit(server, worker):
+    import website
+    website.drain_crawl_jobs(timeout=max(server.cfg.graceful_timeout - CHECKPOINT_GRACE, 0),
+                             stop_timeout=CHECKPOINT_GRACE - 10)
+    from renderer import shared_renderer
+    shared_renderer.close()
@@ -2,30 +2,93 @@ import requests
 from bs4 import BeautifulSoup
 import time
 import logging
+import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
-from collections import Counter
 from datetime import datetime
 from redis_storage import RedisStorage
-import re
+from progress import CrawlProgress
+from site_discovery import RobotsCache, iter_sitemap_urls
+from canonical import canonicalize_url, NearDuplicateIndex
+from frontier import Frontier
+from rate_control import (AdaptiveRateLimiter, THROTTLE_STATUSES, parse_retry_after, busiest_hosts,
+                          track_limiter, untrack_limiter)
+from circuit_breaker import (shared_breaker, classify_failure, NON_RETRYABLE, CIRCUIT_OPEN,
+                             SERVER_ERROR, PARSE_ERROR)
+from metrics import (REGISTRY, STAGE_SECONDS, PAGES_TOTAL, BYTES_TOTAL, ERRORS_TOTAL, RETRIES_TOTAL,
+                     RENDERS_TOTAL, HOST_LIMIT, HOST_IN_FLIGHT, HOST_BACKOFF, InstrumentedAdapter,
+                     reset_connection_timings)
+from profiling import PageProfiler
+from analyzers import PageContext, resolve_analyzers, run_analyzers
+from archive import ResponseArchive
+from page_cache import PageCache
+from renderer import shared_renderer, needs_rendering
+from resource_weights import ResourceSampler, measure_crawl_resources
+
+# Hosts reported by the per-host rate gauges on /metrics
+METRICS_TOP_HOSTS = int(os.getenv('METRICS_TOP_HOSTS', 20))
+
+def _host_gauge(field):
+    return lambda: [({'host': host}, stats[field]) for host, stats in busiest_hosts(METRICS_TOP_HOSTS).items()]
+
+HOST_LIMIT.set_function(_host_gauge('limit'))
+HOST_IN_FLIGHT.set_function(_host_gauge('in_flight'))
+HOST_BACKOFF.set_function(_host_gauge('backoff_remaining'))
 
 class AdvancedWebCrawler:
-    def __init__(self, start_url, max_retries=3, delay=1, max_workers=5):
+    def __init__(self, start_url, max_retries=3, delay=1, max_workers=5, checkpoint_interval=10,
+                 flush_batch_size=10, respect_robots=True, use_sitemaps=True, dedup_min_words=50,
+                 max_depth=None, path_budgets=None, score_fn=None, url_weights=None, circuit_breaker=None,
+                 redis_storage=None, profile_sample_rate=0.0, profile_mode='stages', analyzers=None,
+                 archive_dir=None, page_cache_ttl=0, render_js=False, renderer=None,
+                 measure_resources=False):
         self.start_url = start_url
+        # Compact per-page summaries; full page_info is flushed to Redis in micro-batches
         self.visited_pages = []
+        self.crawl_id = None
+        self.progress = None
+        self.checkpoint_interval = checkpoint_interval
+        self.flush_batch_size = flush_batch_size
+        self._pending_pages = []
+        self._pages_flushed = 0
         self.max_retries = max_retries
         self.delay = delay
         self.max_workers = max_workers
         self.session = requests.Session()
+        self.session.mount('http://', InstrumentedAdapter())
+        self.session.mount('https://', InstrumentedAdapter())
         self._setup_logging()
-        self.redis_storage = RedisStorage()
-        self.tech_patterns = {
-            'wordpress': r'wp-content|wp-includes',
-            'react': r'react\.production\.min\.js',
-            'angular': r'angular\.min\.js',
-            'bootstrap': r'bootstrap\.min\.css',
-            'jquery': r'jquery\.min\.js'
-        }
+        self.redis_storage = redis_storage or RedisStorage()
+        self.use_sitemaps = use_sitemaps
+        self.dedup_min_words = dedup_min_words
+        self.near_duplicates = NearDuplicateIndex()
+        self.circuit_breaker = circuit_breaker or shared_breaker
+        self._stop = threading.Event()
+        self.rate_limiter = AdaptiveRateLimiter(base_delay=delay, max_limit=max_workers,
+                                                min_interval_for=self._robots_crawl_delay, stopped=self._stop)
+        self.frontier = Frontier(max_depth=max_depth, path_budgets=path_budgets,
+                                 score_fn=score_fn, url_weights=url_weights)
+        self.robots = RobotsCache(self.redis_storage.redis_client, self.session) if respect_robots else None
+        # Metric groups computed per page; links are always needed to expand the crawl
+        # and performance records the asset URLs the resource pass measures
+        required = ['links', 'performance'] if measure_resources else ['links']
+        self.analyzers = resolve_analyzers(None if analyzers is None else [*required, *analyzers])
+        # Opt-in: profile_sample_rate of pages get per-stage time and allocation figures
+        self.profiler = PageProfiler(sample_rate=profile_sample_rate, mode=profile_mode)
+        # Optional raw-body archive so pages can be re-analyzed without re-crawling
+        self.archive = ResponseArchive(archive_dir) if archive_dir else None
+        # Reuse pages another crawl fetched with the same analyzers within page_cache_ttl seconds.
+        # Not when archiving: a cached page has no body to archive, so re-analysis would miss it
+        self.page_cache = (PageCache(self.redis_storage.redis_client, page_cache_ttl)
+                           if page_cache_ttl and not self.archive else None)
+        # Opt-in: app-shell pages (React/Angular/Vue with no content yet) are re-loaded in a headless browser
+        self.renderer = renderer or shared_renderer
+        self.render_js = render_js and self.renderer.available
+        if render_js and not self.render_js:
+            self.logger.warning("playwright is not installed; JavaScript pages are analyzed as fetched")
+        # Opt-in: after the crawl, HEAD-sample every unique script, stylesheet and image for page weight
+        self.measure_resources = measure_resources
 
     def _setup_logging(self):
         """Configure logging for the crawler"""
@@ -36,40 +99,6 @@ class AdvancedWebCrawler:
         )
         self.logger = logging.getLogger(__name__)
 
-    def _get_meta_tags(self, soup):
-        """Extract meta tags from the page"""
-        meta_tags = {}
-        for tag in soup.find_all('meta'):
-            name = tag.get('name') or tag.get('property')
-            content = tag.get('content')
-            if name and content:
-                meta_tags[name] = content
-        return meta_tags
-
-    def _count_words(self, soup):
-        """Count words in the page content"""
-        text = soup.get_text()
-        words = text.lower().split()
-        return len(words), Counter(words)
-
-    def _categorize_links(self, base_url, links):
-        """Separate internal and external links"""
-        internal_links = set()
-        external_links = set()
-        base_domain = urlparse(base_url).netloc
-
-        for link in links:
-            try:
-                absolute_url = urljoin(base_url, link)
-                if urlparse(absolute_url).netloc == base_domain:
-                    internal_links.add(absolute_url)
-                else:
-                    external_links.add(absolute_url)
-            except Exception:
-                continue
-
-        return list(internal_links), list(external_links)
-
     def check_url_health(self, url):
         """Synchronously check URL health"""
         try:
@@ -87,194 +116,440 @@ class AdvancedWebCrawler:
             }
 
     def get_page_info(self, url):
-        """Get detailed information about a webpage with retry logic"""
+        """Get detailed information about a webpage, from the page cache when it is enabled"""
+        if self.page_cache is None:
+            return self._fetch_page_info(url)
+        variant = (','.join(sorted(self.analyzers)) + (';render' if self.render_js else '')
+                   + (';assets' if self.measure_resources else ''))
+        return self.page_cache.get_or_fetch(url, variant, lambda: self._fetch_page_info(url))
+
+    def _fetch_page_info(self, url):
+        """Fetch and analyze a webpage with retry logic"""
+        host_control = self.rate_limiter.for_url(url)
+        failure = None
         for attempt in range(self.max_retries):
-            try:
-                start_time = time.time()
-                response = self.session.get(url, timeout=10)
-                load_time = time.time() - start_time
+            if not self.circuit_breaker.allow(url):
+                # Keep the real cause if this URL's own attempts tripped the breaker
+                failure = failure or (CIRCUIT_OPEN, f"Circuit open for {urlparse(url).netloc}", attempt)
+                break
 
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract all links
-                links = [link.get('href') for link in soup.find_all('a') if link.get('href')]
-                internal_links, external_links = self._categorize_links(url, links)
-                
-                # Count words
-                word_count, word_freq = self._count_words(soup)
-                
-                # Get meta tags
-                meta_tags = self._get_meta_tags(soup)
-                
-                page_info = {
-                    'url': url,
-                    'title': soup.title.string if soup.title else "No title",
+            if attempt:
+                RETRIES_TOTAL.inc()
+
+            # Waits for a free slot, pacing and any Retry-After/backoff deadline for the host
+            if not host_control.acquire():
+                return None  # stopped; the URL goes back on the frontier
+            outcome = {'failed': True}
+            connection_timings = reset_connection_timings()
+            try:
+                start_time = time.perf_counter()
+                response = self.session.get(url, timeout=10, stream=True)
+                headers_at = time.perf_counter()
+                body = response.content
+                load_time = time.perf_counter() - start_time
+                outcome = {
+                    'latency': load_time,
                     'status_code': response.status_code,
-                    'load_time': round(load_time, 2),
-                    'content_length': len(response.content),
-                    'internal_links': internal_links,
-                    'external_links': external_links,
-                    'images_found': len(soup.find_all('img')),
-                    'word_count': word_count,
-                    'top_words': dict(word_freq.most_common(10)),
-                    'meta_tags': meta_tags,
-                    'headers': dict(response.headers),
-                    'timestamp': datetime.now().isoformat(),
-                    # New information
-                    'scripts': len(soup.find_all('script')),
-                    'stylesheets': len(soup.find_all('link', rel='stylesheet')),
-                    'forms': len(soup.find_all('form')),
-                    'social_links': self._get_social_links(soup),
-                    'responsive_meta': bool(soup.find('meta', {'name': 'viewport'})),
-                    'h1_count': len(soup.find_all('h1')),
-                    'text_to_html_ratio': self._calculate_text_ratio(soup),
-                    'languages': [lang.get('lang', 'unknown') for lang in soup.find_all('html', lang=True)],
-                    'seo_metrics': self._analyze_seo(soup, url),
-                    'security_headers': self._check_security_headers(response.headers),
-                    'performance_metrics': self._analyze_performance(soup, load_time),
-                    'accessibility': self._check_accessibility(soup),
-                    'technologies': self._detect_technologies(soup, response.text)
+                    'retry_after': parse_retry_after(response.headers.get('Retry-After')),
                 }
+            except Exception as e:
+                failure_type = classify_failure(e)
+                failure = (failure_type, str(e), attempt + 1)
+                ERRORS_TOTAL.inc(type=failure_type)
+                self.circuit_breaker.record_failure(url, failure_type)
+                self.logger.error(f"Attempt {attempt + 1} failed for {url} ({failure_type}): {str(e)}")
+                if failure_type in NON_RETRYABLE:
+                    break
+                continue
+            finally:
+                host_control.release(**outcome)
+
+            BYTES_TOTAL.inc(len(body))
+            timings = {
+                'connect': connection_timings['connect'],
+                'ttfb': headers_at - start_time,
+                'download': load_time - (headers_at - start_time),
+            }
+
+            if response.status_code >= 500:
+                ERRORS_TOTAL.inc(type=SERVER_ERROR)
+                self.circuit_breaker.record_failure(url, SERVER_ERROR)
+            else:
+                self.circuit_breaker.record_success(url)
+
+            retryable = response.status_code in THROTTLE_STATUSES or response.status_code >= 500
+            if retryable and attempt < self.max_retries - 1:
+                self.logger.warning(f"Attempt {attempt + 1} got {response.status_code} for {url}, retrying")
+                continue
+
+            try:
+                with self.profiler.sample(url) as profile:
+                    parse_start = time.perf_counter()
+                    with self.profiler.stage('soup'):
+                        soup = BeautifulSoup(response.text, 'html.parser')
+                    timings['parse'] = time.perf_counter() - parse_start
+
+                    rendered = None
+                    if self.render_js and needs_rendering(soup, response.text):
+                        with self.profiler.stage('render'):
+                            rendered = self._render(url, host_control)
+                        if rendered:
+                            timings['render'] = rendered['render_time']
+                            soup = BeautifulSoup(rendered['html'], 'html.parser')
+                    browser_timings = rendered['timings'] if rendered else None
+                    analyze_start = time.perf_counter()
+
+                    context = PageContext(url, response, body, soup, load_time, browser_timings,
+                                          record_assets=self.measure_resources)
+                    page_info = {
+                        'url': url,
+                        'title': soup.title.string if soup.title else "No title",
+                        'status_code': response.status_code,
+                        'load_time': round(load_time, 2),
+                        'content_length': len(body),
+                        'headers': dict(response.headers),
+                        'timestamp': datetime.now().isoformat(),
+                    }
+                    if rendered:
+                        page_info['rendered'] = True
+                        page_info['browser_timings'] = browser_timings
+                    page_info.update(run_analyzers(context, self.analyzers, self.profiler.stage))
+                    timings['analyze'] = time.perf_counter() - analyze_start
+                if profile:
+                    page_info['profile'] = profile
+                if self.archive:
+                    # Archive what was analyzed, so re-analysis sees the rendered DOM
+                    page_info['archive'] = (self._archive_body(url, rendered['html'].encode('utf-8'), 'utf-8')
+                                            if rendered else self._archive_body(url, body, response.encoding))
+                
+                for stage, seconds in timings.items():
+                    STAGE_SECONDS.observe(seconds, stage=stage)
+                page_info['timings'] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+                PAGES_TOTAL.inc(outcome='ok')
                 
                 self.logger.info(f"Successfully processed {url}")
-                time.sleep(self.delay)  # Respect robots.txt
                 return page_info
 
             except Exception as e:
+                failure = (PARSE_ERROR, str(e), attempt + 1)
+                ERRORS_TOTAL.inc(type=PARSE_ERROR)
                 self.logger.error(f"Attempt {attempt + 1} failed for {url}: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    return None
-                time.sleep(self.delay * (attempt + 1))  # Exponential backoff
-
-    def _get_social_links(self, soup):
-        """Extract social media links from the page"""
-        social_patterns = {
-            'facebook': r'facebook.com',
-            'twitter': r'twitter.com|x.com',
-            'linkedin': r'linkedin.com',
-            'instagram': r'instagram.com',
-            'youtube': r'youtube.com'
-        }
-        
-        social_links = {}
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            for platform, pattern in social_patterns.items():
-                if re.search(pattern, href, re.I):
-                    social_links[platform] = href
-        return social_links
-
-    def _calculate_text_ratio(self, soup):
-        """Calculate the ratio of text content to HTML"""
-        text_content = len(soup.get_text())
-        html_content = len(str(soup))
-        return round((text_content / html_content) * 100, 2) if html_content > 0 else 0
-
-    def _analyze_seo(self, soup, url):
-        """Analyze SEO elements"""
-        return {
-            'meta_description': bool(soup.find('meta', {'name': 'description'})),
-            'canonical_url': bool(soup.find('link', {'rel': 'canonical'})),
-            'robots_meta': bool(soup.find('meta', {'name': 'robots'})),
-            'sitemap_links': bool(soup.find('a', href=re.compile(r'sitemap\.xml'))),
-            'has_schema': bool(soup.find(attrs={"type": "application/ld+json"}))
-        }
 
-    def _check_security_headers(self, headers):
-        """Analyze security headers"""
-        security_headers = {
-            'X-Content-Type-Options': headers.get('X-Content-Type-Options', 'Not Set'),
-            'X-Frame-Options': headers.get('X-Frame-Options', 'Not Set'),
-            'X-XSS-Protection': headers.get('X-XSS-Protection', 'Not Set'),
-            'Content-Security-Policy': headers.get('Content-Security-Policy', 'Not Set'),
-            'Strict-Transport-Security': headers.get('Strict-Transport-Security', 'Not Set')
-        }
-        return security_headers
+        if failure:
+            PAGES_TOTAL.inc(outcome='failed')
+            return self._failure_page(url, *failure)
+        return None
 
-    def _analyze_performance(self, soup, load_time):
-        """Analyze performance metrics"""
-        return {
-            'total_load_time': load_time,
-            'script_count': len(soup.find_all('script')),
-            'css_count': len(soup.find_all('link', rel='stylesheet')),
-            'image_size': sum(len(str(img)) for img in soup.find_all('img')),
-            'total_links': len(soup.find_all('a')),
-            'resource_hints': len(soup.find_all('link', rel=re.compile(r'preload|prefetch|preconnect')))
-        }
+    def _render(self, url, host_control):
+        """Load url in the headless browser; None (analyze the fetched HTML) if that fails"""
+        if not host_control.acquire():
+            return None
+        outcome = {}
+        try:
+            rendered = self.renderer.render(url)
+            # Only throttling feeds back: render time is not comparable with fetch latency
+            outcome = {'status_code': rendered['status_code']}
+            RENDERS_TOTAL.inc(outcome='ok')
+            return rendered
+        except Exception as e:
+            RENDERS_TOTAL.inc(outcome='failed')
+            self.logger.error(f"Rendering failed for {url}: {str(e)}")
+            return None
+        finally:
+            host_control.release(**outcome)
 
-    def _check_accessibility(self, soup):
-        """Check basic accessibility features"""
+    def _archive_body(self, url, body, encoding):
+        """Store the raw body in the archive; archiving problems never fail the page"""
+        try:
+            return self.archive.store(body, encoding)
+        except Exception as e:
+            self.logger.error(f"Could not archive {url}: {str(e)}")
+            return {}
+
+    def _failure_page(self, url, failure_type, message, attempts):
+        """page_info for a URL that could not be fetched, recording why"""
         return {
-            'images_with_alt': len([img for img in soup.find_all('img') if img.get('alt')]),
-            'aria_landmarks': len(soup.find_all(attrs={"role": True})),
-            'form_labels': len(soup.find_all('label')),
-            'skip_links': bool(soup.find('a', href='#main-content')),
-            'language_specified': bool(soup.find('html', lang=True))
+            'url': url,
+            'title': 'Fetch failed',
+            'status_code': 0,
+            'load_time': 0,
+            'content_length': 0,
+            'internal_links': [],
+            'external_links': [],
+            'images_found': 0,
+            'word_count': 0,
+            'timestamp': datetime.now().isoformat(),
+            'error': {'type': failure_type, 'message': message, 'attempts': attempts},
         }
 
-    def _detect_technologies(self, soup, response_text):
-        """Detect technologies used on the website"""
-        technologies = {}
-        for tech, pattern in self.tech_patterns.items():
-            if re.search(pattern, response_text, re.I):
-                technologies[tech] = True
-        
-        # Additional framework detection
-        if soup.find('meta', {'name': 'generator'}):
-            technologies['cms'] = soup.find('meta', {'name': 'generator'})['content']
-        
-        return technologies
+    def _robots_crawl_delay(self, url):
+        """The host's robots.txt Crawl-delay, used as a floor between requests"""
+        if self.robots is None:
+            return 0
+        try:
+            return self.robots.crawl_delay(url) or 0
+        except Exception:
+            return 0
 
-    def crawl(self, max_pages=5):
-        """Crawl websites using ThreadPoolExecutor"""
-        self.logger.info(f"Starting crawl from: {self.start_url}")
-        
-        urls_to_visit = [self.start_url]
+    def _is_allowed(self, url):
+        """Check robots.txt rules for url"""
+        if self.robots is None:
+            return True
+        try:
+            return self.robots.allowed(url)
+        except Exception as e:
+            self.logger.error(f"robots.txt check failed for {url}: {str(e)}")
+            return True
+
+    def _sitemap_seeds(self, limit):
+        """Collect up to limit same-host (url, priority) pairs from the site's sitemaps"""
+        base_domain = urlparse(self.start_url).netloc
+        sitemap_urls = self.robots.sitemaps(self.start_url) if self.robots else [
+            urljoin(self.start_url, '/sitemap.xml')
+        ]
+        seeds = []
+        for url, priority in iter_sitemap_urls(self.session, sitemap_urls, max_urls=limit * 4):
+            if urlparse(url).netloc == base_domain:
+                seeds.append((url, priority))
+                if len(seeds) >= limit:
+                    break
+        self.logger.info(f"Seeded {len(seeds)} URLs from sitemaps")
+        return seeds
+
+    def stop(self):
+        """Ask a running crawl to checkpoint and return early, leaving it resumable.
+
+        Pages already being fetched are finished and stored; queued ones go
+        back on the frontier.
+        """
+        self._stop.set()
+        # Workers waiting out a host's pacing or backoff give up their URL at once
+        self.rate_limiter.wake()
+
+    def crawl(self, max_pages=5, resume_id=None):
+        """Crawl websites using ThreadPoolExecutor, persisting pages as they complete.
+
+        Passing resume_id continues an interrupted crawl from its last checkpoint
+        without re-fetching pages that were already stored. If the crawl raises,
+        a 'failed' progress status carrying the error is published first.
+        """
+        track_limiter(self.rate_limiter)
+        try:
+            return self._crawl(max_pages, resume_id)
+        except Exception as e:
+            self.logger.error(f"Crawl {self.crawl_id or self.start_url} failed: {str(e)}")
+            if self.crawl_id is not None:
+                progress = self.progress or CrawlProgress(self.redis_storage, self.crawl_id)
+                progress.error = str(e)
+                progress.publish(status='failed', force=True)
+            raise
+        finally:
+            untrack_limiter(self.rate_limiter)
+
+    def _crawl(self, max_pages, resume_id):
+        frontier = self.frontier
         visited = set()
+        pages_stored = 0
+
+        if resume_id:
+            state = self.redis_storage.load_checkpoint(resume_id)
+            if state is None:
+                raise ValueError(f"No checkpoint to resume from: {resume_id}")
+            self.crawl_id = resume_id
+            self.start_url = state['start_url']
+            for url, depth, hint in state['frontier']:
+                frontier.push(url, depth, hint)
+            visited = state['visited']
+            pages_stored = state['pages_stored']
+            # Pages stored before the interruption are health-checked with the new ones
+            self.visited_pages = self._stored_pages(pages_stored)
+            self.logger.info(f"Resuming crawl {resume_id} with {len(frontier)} queued URLs")
+        else:
+            self.register()
+            self.logger.info(f"Starting crawl from: {self.start_url}")
+            frontier.push(canonicalize_url(self.start_url), 0)
+            if self.use_sitemaps and not self._stop.is_set():
+                for url, priority in self._sitemap_seeds(max_pages):
+                    frontier.push(canonicalize_url(url), 1, priority)
+
+        self.progress = CrawlProgress(self.redis_storage, self.crawl_id, host_stats=self.rate_limiter.snapshot)
+        self.progress.pages_done = pages_stored
+
+        self._pages_flushed = pages_stored
+        last_checkpoint = pages_stored
         
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            while urls_to_visit and len(visited) < max_pages:
-                future_to_url = {
-                    executor.submit(self.get_page_info, url): url 
-                    for url in urls_to_visit[:max_pages - len(visited)]
-                    if url not in visited
-                }
-                
-                urls_to_visit = urls_to_visit[max_pages - len(visited):]
+            while frontier and pages_stored < max_pages and not self._stop.is_set():
+                batch = {}
+                while frontier and len(batch) < max_pages - pages_stored:
+                    entry = frontier.pop()
+                    if entry is None:
+                        break
+                    url, depth = entry
+                    if url in visited:
+                        continue
+                    if not self._is_allowed(url):
+                        # Never fetch it, and never reconsider it
+                        visited.add(url)
+                        self.logger.info(f"Skipping {url}: disallowed by robots.txt")
+                        continue
+                    batch[url] = depth
+
+                future_to_url = {executor.submit(self.get_page_info, url): url for url in batch}
                 
                 for future in future_to_url:
                     url = future_to_url[future]
+                    if self._stop.is_set() and future.cancel():
+                        frontier.push(url, batch[url])
+                        continue
                     try:
                         page_info = future.result()
-                        if page_info:
-                            self.visited_pages.append(page_info)
+                        if not page_info and self._stop.is_set():
+                            # Gave up waiting for the host when the crawl was stopped
+                            frontier.push(url, batch[url])
+                        elif not page_info:
+                            self.progress.record_error()
+                        else:
+                            page_info['depth'] = batch[url]
+                            failed = 'error' in page_info
+                            duplicate_of = None
+                            if failed:
+                                self.progress.record_error()
+                            else:
+                                self.progress.record_page(page_info['load_time'])
+                                duplicate_of = self._find_duplicate(page_info, visited)
+                                if duplicate_of:
+                                    page_info['near_duplicate_of'] = duplicate_of
+                            self.visited_pages.append(self._summarize_page(page_info, pages_stored))
+                            self._pending_pages.append(page_info)
+                            pages_stored += 1
                             visited.add(url)
-                            
-                            # Add new internal links to visit
-                            urls_to_visit.extend([
-                                link for link in page_info['internal_links']
-                                if link not in visited
-                            ])
+                            if page_info.get('canonical_url'):
+                                visited.add(page_info['canonical_url'])
+
+                            # Add new internal links to visit, unless this page
+                            # only repeats content we have already expanded
+                            if not failed and not duplicate_of:
+                                for link in page_info['internal_links']:
+                                    if link not in visited:
+                                        frontier.push(link, batch[url] + 1)
+                            if len(self._pending_pages) >= self.flush_batch_size:
+                                self._flush_pages()
                     except Exception as e:
+                        self.progress.record_error()
                         self.logger.error(f"Error processing {url}: {str(e)}")
 
+                    self.progress.queue_depth = len(frontier)
+                    self.progress.publish()
+
+                if pages_stored - last_checkpoint >= self.checkpoint_interval:
+                    # Checkpoints only ever cover pages that are already in Redis
+                    self._flush_pages()
+                    self.redis_storage.save_checkpoint(self.crawl_id, frontier.snapshot(), visited, pages_stored)
+                    last_checkpoint = pages_stored
+
+        self._flush_pages()
+
+        if self._stop.is_set():
+            self.redis_storage.save_checkpoint(self.crawl_id, frontier.snapshot(), visited, pages_stored)
+            self.progress.publish(status='interrupted', force=True)
+            self.logger.info(f"Crawl {self.crawl_id} stopped at {pages_stored} pages; resume it to continue")
+            return self.crawl_id
+
         # Perform health check on all visited URLs
         self._check_all_urls_health()
-        self.save_results()
+        if self.measure_resources:
+            self._measure_resources()
+        return self.save_results()
+
+    def _find_duplicate(self, page_info, visited):
+        """Return the URL this page duplicates, via rel=canonical or content fingerprint"""
+        canonical = page_info['canonical_url']
+        if canonical and canonical != page_info['url'] and canonical in visited:
+            return canonical
+        if 'content_fingerprint' not in page_info or page_info.get('word_count', 0) < self.dedup_min_words:
+            return None
+        fingerprint = int(page_info['content_fingerprint'], 16)
+        duplicate_of = self.near_duplicates.find(fingerprint)
+        if duplicate_of is None:
+            self.near_duplicates.add(fingerprint, page_info['url'])
+        return duplicate_of
+
+    def register(self):
+        """Allocate the crawl ID up front so callers can watch progress before crawling starts"""
+        if self.crawl_id is None:
+            self.crawl_id = self.redis_storage.create_crawl(self.start_url)
+        return self.crawl_id
+
+    def _summarize_page(self, page_info, index):
+        """Keep only what the crawler still needs once a page has been handed off to Redis"""
+        return {
+            'url': page_info['url'],
+            'status_code': page_info['status_code'],
+            'word_count': page_info.get('word_count', 0),
+            'images_found': page_info.get('images_found', 0),
+            'error': page_info.get('error'),
+            '_index': index,
+        }
+
+    def _stored_pages(self, count, chunk_size=1000):
+        """Summaries of the first count pages already stored for this crawl"""
+        fields = ['url', 'status_code', 'word_count', 'images_found', 'error']
+        pages = []
+        for start in range(0, count, chunk_size):
+            stored = self.redis_storage.get_crawl_pages(self.crawl_id, start, min(start + chunk_size, count) - 1,
+                                                        fields=fields)
+            pages.extend({**page, '_index': index} for index, page in enumerate(stored, start))
+        return pages
+
+    def _flush_pages(self):
+        """Write buffered pages to Redis in a single pipeline"""
+        if not self._pending_pages:
+            return
+        start = time.perf_counter()
+        self.redis_storage.store_pages(self.crawl_id, self._pages_flushed, self._pending_pages)
+        per_page = (time.perf_counter() - start) / len(self._pending_pages)
+        for _ in self._pending_pages:
+            STAGE_SECONDS.observe(per_page, stage='store')
+        self._pages_flushed += len(self._pending_pages)
+        self._pending_pages = []
 
     def _check_all_urls_health(self):
         """Check health of all visited URLs synchronously"""
-        urls = [page['url'] for page in self.visited_pages]
+        pages = [page for page in self.visited_pages if not page.get('error')]
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            health_results = list(executor.map(self.check_url_health, urls))
+            health_results = list(executor.map(self.check_url_health, [page['url'] for page in pages]))
         
         # Add health check results to visited pages
-        for page, health in zip(self.visited_pages, health_results):
+        for page, health in zip(pages, health_results):
             page['health_check'] = health
 
+    def _measure_resources(self):
+        """Store real page weights and the crawl's asset caching report; failures never fail the crawl"""
+        sampler = ResourceSampler(self.session, max_workers=max(self.max_workers * 4, 8))
+        try:
+            report = measure_crawl_resources(self.redis_storage, self.crawl_id, sampler)
+            self.logger.info(f"Measured {report['assets']['unique']} assets in {report['seconds']}s")
+        except Exception as e:
+            self.logger.error(f"Resource measurement failed for {self.crawl_id}: {str(e)}")
+
     def save_results(self):
-        """Save detailed crawling results to Redis"""
-        crawl_id = self.redis_storage.store_crawl_data(self.start_url, self.visited_pages)
-        self.logger.info(f"Results saved to Redis with crawl ID: {crawl_id}")
-        return crawl_id
+        """Write health checks onto the stored pages and mark the crawl complete"""
+        if self.crawl_id is None:
+            return None
 
+        self._flush_pages()
+        self.redis_storage.update_pages(self.crawl_id, {
+            page['_index']: {'health_check': page['health_check']}
+            for page in self.visited_pages if 'health_check' in page
+        })
+        self.redis_storage.finalize_crawl(self.crawl_id)
+        if self.progress:
+            self.progress.queue_depth = 0
+            self.progress.publish(status='completed', force=True)
+        self.logger.info(f"Results saved to Redis with crawl ID: {self.crawl_id}")
+        try:
+            REGISTRY.flush_to_redis(self.redis_storage.redis_client)
+        except Exception as e:
+            self.logger.error(f"Could not flush metrics: {str(e)}")
+        return self.crawl_id
@@ -0,0 +1,285 @@
+# metrics.py
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+CLUSTER_KEY = "metrics:cluster"
+# Each worker process's gauges live under this prefix until they go stale
+GAUGE_KEY_PREFIX = "metrics:gauges:"
+GAUGE_TTL = 30
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    rendered = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def _with_label(series, name, value):
+    """Add one label to a rendered series"""
+    if series.endswith('}'):
+        return f'{series[:-1]},{name}="{value}"}}'
+    return f'{series}{{{name}="{value}"}}'
+
+
+def _sort_key(series):
+    """Order series by name and labels, with histogram buckets in numeric le order"""
+    match = re.search(r'le="([^"]+)"', series)
+    return re.sub(r',?le="[^"]+"', '', series), float(match.group(1)) if match else 0.0
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _series(self.name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        with self._lock:
+            for bound in self.buckets:
+                if value <= bound:
+                    key = _series(f"{self.name}_bucket", {**labels, 'le': bound})
+                    self._values[key] = self._values.get(key, 0) + 1
+            for suffix, amount in (('_bucket', 1), ('_sum', value), ('_count', 1)):
+                extra = {'le': '+Inf'} if suffix == '_bucket' else {}
+                key = _series(f"{self.name}{suffix}", {**labels, **extra})
+                self._values[key] = self._values.get(key, 0) + amount
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """Current values read from a callback; reported per worker process (worker label), never summed"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._collect = None
+
+    def set_function(self, collect):
+        """collect() returns [(labels, value)] for every series to report"""
+        self._collect = collect
+
+    def samples(self):
+        if self._collect is None:
+            return {}
+        return {_series(self.name, labels): value for labels, value in self._collect()}
+
+
+class Registry:
+    """Process-local metrics that can be merged into a cluster-wide Redis hash"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._flushed = {}
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def counter(self, name, documentation):
+        return self._metrics.setdefault(name, Counter(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, documentation, buckets))
+
+    def gauge(self, name, documentation):
+        return self._metrics.setdefault(name, Gauge(name, documentation))
+
+    def samples(self, gauges=True):
+        merged = {}
+        for metric in self._metrics.values():
+            if gauges or metric.kind != 'gauge':
+                merged.update(metric.samples())
+        return merged
+
+    def gauge_samples(self):
+        merged = {}
+        for metric in self._metrics.values():
+            if metric.kind == 'gauge':
+                merged.update(metric.samples())
+        return merged
+
+    def render(self, samples=None):
+        """Render samples (local ones by default) in the Prometheus text format"""
+        samples = self.samples() if samples is None else samples
+        lines = []
+        for metric in self._metrics.values():
+            family = [
+                (series, value) for series, value in sorted(samples.items(), key=lambda item: _sort_key(item[0]))
+                if re.match(rf"{metric.name}(_bucket|_sum|_count)?(\{{|$)", series)
+            ]
+            if not family:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{series} {float(value):g}" for series, value in family)
+        return '\n'.join(lines) + '\n'
+
+    def flush_to_redis(self, redis_client):
+        """Add everything recorded since the last flush to the cluster-wide totals.
+
+        Gauges are not totals: this process's current values replace its
+        previous snapshot, which expires GAUGE_TTL seconds after the last flush.
+        """
+        with self._flush_lock:
+            current = self.samples(gauges=False)
+            deltas = {
+                series: value - self._flushed.get(series, 0)
+                for series, value in current.items()
+                if value != self._flushed.get(series, 0)
+            }
+            gauges = self.gauge_samples()
+            # Read per flush: gunicorn workers fork after this module is imported
+            gauge_key = f"{GAUGE_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+            with redis_client.pipeline(transaction=False) as pipe:
+                for series, delta in deltas.items():
+                    pipe.hincrbyfloat(CLUSTER_KEY, series, delta)
+                pipe.delete(gauge_key)
+                if gauges:
+                    pipe.hset(gauge_key, mapping=gauges)
+                    pipe.expire(gauge_key, GAUGE_TTL)
+                pipe.execute()
+            self._flushed = current
+
+    def render_cluster(self, redis_client):
+        """Render the totals of every replica, as merged in Redis, and every live worker's gauges"""
+        samples = {series: float(value) for series, value in redis_client.hgetall(CLUSTER_KEY).items()}
+        for key in redis_client.scan_iter(match=f"{GAUGE_KEY_PREFIX}*"):
+            worker = key[len(GAUGE_KEY_PREFIX):]
+            for series, value in redis_client.hgetall(key).items():
+                samples[_with_label(series, 'worker', worker)] = float(value)
+        return self.render(samples)
+
+    def start_flusher(self, redis_client, interval=10):
+        """Flush to Redis in the background every interval seconds"""
+        if self._flusher and self._flusher.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush_to_redis(redis_client)
+                except Exception:
+                    pass
+
+        self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'crawler_stage_seconds', 'Time spent per page in each crawl stage (connect, ttfb, download, parse, analyze, store)')
+PAGES_TOTAL = REGISTRY.counter('crawler_pages_total', 'Pages processed, by outcome')
+BYTES_TOTAL = REGISTRY.counter('crawler_bytes_total', 'Response body bytes downloaded')
+ERRORS_TOTAL = REGISTRY.counter('crawler_errors_total', 'Failed fetch attempts, by failure type')
+RETRIES_TOTAL = REGISTRY.counter('crawler_retries_total', 'Fetch attempts beyond the first')
+REDIS_SECONDS = REGISTRY.histogram(
+    'crawler_redis_seconds', 'Redis round-trip time, by storage operation',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+REDIS_READS = REGISTRY.counter('crawler_redis_reads_total', 'Read requests served, by target (replica or master)')
+PAGE_CACHE_TOTAL = REGISTRY.counter('crawler_page_cache_total', 'Page lookups in the cross-crawl page cache, by outcome (hit, coalesced, miss)')
+RENDERS_TOTAL = REGISTRY.counter('crawler_renders_total', 'Pages re-loaded in the headless browser, by outcome')
+HOST_LIMIT = REGISTRY.gauge(
+    'crawler_host_concurrency_limit',
+    'AIMD concurrency limit per host, summed over the crawls running in one worker process (worker label)')
+HOST_IN_FLIGHT = REGISTRY.gauge(
+    'crawler_host_in_flight', 'Requests in flight per host in one worker process (worker label)')
+HOST_BACKOFF = REGISTRY.gauge(
+    'crawler_host_backoff_seconds',
+    'Seconds until a host may be requested again after a throttle or failure, per worker process (worker label)')
+
+
+# Connection-level timings for the request currently running on this thread
+_connection_timings = threading.local()
+
+
+def reset_connection_timings():
+    _connection_timings.values = {'connect': 0.0}
+    return _connection_timings.values
+
+
+class _TimedConnectionMixin:
+    def connect(self):
+        timings = getattr(_connection_timings, 'values', None)
+        start = time.perf_counter()
+        # Name resolution, TCP and TLS handshakes together: resolving
+        # separately would look every host up twice
+        super().connect()
+        if timings is not None:
+            timings['connect'] += time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class InstrumentedAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter whose new connections report their connect time, DNS lookup included"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
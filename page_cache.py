@@ -0,0 +1,118 @@
+# page_cache.py
+import hashlib
+import json
+import time
+import uuid
+
+from circuit_breaker import CIRCUIT_OPEN
+from metrics import PAGE_CACHE_TOTAL
+
+# page_info fields that describe this crawl's fetch rather than the page; archive
+# points into the fetching replica's own ARCHIVE_DIR
+LOCAL_FIELDS = ('profile', 'depth', 'near_duplicate_of', 'archive')
+
+
+class PageCache:
+    """Recent page_info results shared by every crawl through Redis, keyed by URL and analyzer set.
+
+    Concurrent misses for the same URL are coalesced: the first caller takes
+    a short lock and fetches, the others poll for its result and only fetch
+    themselves if it does not show up within wait_timeout. Redis problems
+    never fail a page; the cache is simply bypassed.
+    """
+
+    def __init__(self, redis_client, ttl, error_ttl=60, lock_ttl=60, wait_timeout=30, poll_interval=0.05):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        # Failed fetches are shared briefly so concurrent crawls don't all retry a dead page
+        self.error_ttl = min(error_ttl, ttl)
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def _key(self, url, variant):
+        return "pagecache:" + hashlib.sha1(f"{variant}\n{url}".encode('utf-8')).hexdigest()
+
+    def get(self, url, variant):
+        """A cached page_info no older than ttl seconds, or None"""
+        try:
+            raw = self.redis_client.get(self._key(url, variant))
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if time.time() - entry['cached_at'] > self.ttl:
+            return None
+        return entry['page_info']
+
+    def put(self, url, variant, page_info):
+        error = page_info.get('error')
+        if error and error.get('type') == CIRCUIT_OPEN:
+            # A local breaker decision, not something other crawls should inherit
+            return
+        page_info = {field: value for field, value in page_info.items() if field not in LOCAL_FIELDS}
+        try:
+            self.redis_client.set(self._key(url, variant),
+                                  json.dumps({'cached_at': time.time(), 'page_info': page_info}),
+                                  ex=max(int(self.error_ttl if error else self.ttl), 1))
+        except Exception:
+            pass
+
+    def _release(self, lock_key, token):
+        """Delete the lock only if it is still ours"""
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+        except Exception:
+            pass
+
+    def _wait(self, url, variant, lock_key):
+        """Poll for another crawl's result until it arrives or its lock goes away"""
+        deadline = time.monotonic() + self.wait_timeout
+        interval = self.poll_interval
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            page_info = self.get(url, variant)
+            if page_info is not None:
+                return page_info
+            try:
+                if not self.redis_client.exists(lock_key):
+                    return self.get(url, variant)
+            except Exception:
+                return None
+            interval = min(interval * 2, 0.5)
+        return None
+
+    def get_or_fetch(self, url, variant, fetch):
+        """Return the cached page_info for url, fetching it (once across all crawls) on a miss"""
+        page_info = self.get(url, variant)
+        if page_info is not None:
+            PAGE_CACHE_TOTAL.inc(outcome='hit')
+            return page_info
+
+        lock_key = self._key(url, variant) + ":lock"
+        token = uuid.uuid4().hex
+        try:
+            leader = self.redis_client.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except Exception:
+            leader = True  # no coordination without Redis; just fetch
+        if not leader:
+            page_info = self._wait(url, variant, lock_key)
+            if page_info is not None:
+                PAGE_CACHE_TOTAL.inc(outcome='coalesced')
+                return page_info
+
+        PAGE_CACHE_TOTAL.inc(outcome='miss')
+        try:
+            page_info = fetch()
+            if page_info:
+                self.put(url, variant, page_info)
+            return page_info
+        finally:
+            if leader:
+                self._release(lock_key, token)
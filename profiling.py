@@ -0,0 +1,132 @@
+# profiling.py
+import cProfile
+import contextlib
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+STAGES_MODE = 'stages'
+CPROFILE_MODE = 'cprofile'
+
+
+class PageProfiler:
+    """Sampled per-page profiling of the analysis pipeline.
+
+    A sample_rate fraction of pages is profiled. For those, every stage (the
+    BeautifulSoup build and each analyzer) records its wall time and, with
+    track_allocations, the peak memory tracemalloc saw above the stage's
+    starting point. In cprofile mode the sampled page also runs
+    under cProfile and the most expensive functions are kept.
+
+    tracemalloc and cProfile are process-wide, so allocation peaks and
+    function timings include whatever other workers did at the same time;
+    treat them as approximate when max_workers > 1.
+    """
+
+    def __init__(self, sample_rate=0.0, mode=STAGES_MODE, track_allocations=True, top_functions=15):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.mode = mode
+        self.track_allocations = track_allocations
+        self.top_functions = top_functions
+        self._local = threading.local()
+        self._tracemalloc_users = 0
+        self._owns_tracemalloc = False
+        self._tracemalloc_lock = threading.Lock()
+        # Only one cProfile profiler can be active per process at a time
+        self._cprofile_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def _start_tracemalloc(self):
+        with self._tracemalloc_lock:
+            if self._tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+            elif self._tracemalloc_users == 0:
+                self._owns_tracemalloc = False
+            self._tracemalloc_users += 1
+
+    def _stop_tracemalloc(self):
+        with self._tracemalloc_lock:
+            self._tracemalloc_users -= 1
+            if self._tracemalloc_users == 0 and self._owns_tracemalloc:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def sample(self, url):
+        """Profile the enclosed work if this page is sampled.
+
+        Yields the profile dict that stages fill in (None when the page is
+        not sampled); it is complete once the block exits.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield None
+            return
+
+        profile = {'url': url, 'stages': {}}
+        profiler = None
+        if self.mode == CPROFILE_MODE and self._cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        if self.track_allocations:
+            self._start_tracemalloc()
+        self._local.profile = profile
+        start = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            yield profile
+        finally:
+            if profiler:
+                profiler.disable()
+                self._cprofile_lock.release()
+            profile['total_seconds'] = round(time.perf_counter() - start, 6)
+            self._local.profile = None
+            if self.track_allocations:
+                self._stop_tracemalloc()
+            if profiler:
+                profile['functions'] = self._top_functions(profiler)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Attribute the enclosed work to a stage of the current sampled page"""
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            yield
+            return
+
+        tracing = self.track_allocations and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = profile['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0, 'alloc_peak_bytes': 0})
+            entry['seconds'] = round(entry['seconds'] + time.perf_counter() - start, 6)
+            entry['calls'] += 1
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - start_memory
+                entry['alloc_peak_bytes'] = max(entry['alloc_peak_bytes'], peak)
+
+    def _top_functions(self, profiler):
+        """The functions with the highest cumulative time, as JSON-friendly dicts"""
+        stats = pstats.Stats(profiler)
+        # Leave out the profiler's own stage wrappers, which would otherwise top the list
+        ranked = sorted((
+            item for item in stats.stats.items()
+            if item[0][0] not in (__file__, contextlib.__file__)
+        ), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                'function': f"{filename.rsplit('/', 1)[-1]}:{line}({name})",
+                'calls': calls,
+                'own_seconds': round(own, 6),
+                'cumulative_seconds': round(cumulative, 6),
+            }
+            for (filename, line, name), (_, calls, own, cumulative, _) in ranked[:self.top_functions]
+        ]
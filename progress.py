@@ -0,0 +1,135 @@
+# progress.py
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+PROGRESS_CHANNEL = "crawl_progress"
+
+
+class CrawlProgress:
+    """Track live statistics for a running crawl and publish them at a bounded rate"""
+
+    def __init__(self, redis_storage, crawl_id, publish_interval=1.0, latency_window=1000, host_stats=None):
+        self.redis_storage = redis_storage
+        self.host_stats = host_stats
+        self.crawl_id = crawl_id
+        self.publish_interval = publish_interval
+        self.pages_done = 0
+        self.errors = 0
+        self.queue_depth = 0
+        self.latencies = deque(maxlen=latency_window)
+        # Set when the crawl fails, and published with the 'failed' status
+        self.error = None
+        self.started_at = time.perf_counter()
+        self._last_publish = 0.0
+
+    def record_page(self, load_time):
+        self.pages_done += 1
+        self.latencies.append(load_time)
+
+    def record_error(self):
+        self.errors += 1
+
+    def _percentile(self, ordered, fraction):
+        if not ordered:
+            return 0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def snapshot(self, status='running'):
+        """Return the current progress as a flat dict of JSON-friendly values"""
+        elapsed = time.perf_counter() - self.started_at
+        ordered = sorted(self.latencies)
+        snapshot = {
+            'crawl_id': self.crawl_id,
+            'status': status,
+            'pages_done': self.pages_done,
+            'queue_depth': self.queue_depth,
+            'errors': self.errors,
+            'elapsed': round(elapsed, 2),
+            'fetch_rate': round(self.pages_done / elapsed, 2) if elapsed > 0 else 0,
+            'latency_p50': round(self._percentile(ordered, 0.50), 3),
+            'latency_p95': round(self._percentile(ordered, 0.95), 3),
+        }
+        if self.error:
+            snapshot['error'] = self.error
+        if self.host_stats:
+            snapshot['hosts'] = self.host_stats()
+        return snapshot
+
+    def publish(self, status='running', force=False):
+        """Publish a snapshot unless one went out less than publish_interval ago"""
+        now = time.perf_counter()
+        if not force and now - self._last_publish < self.publish_interval:
+            return
+        self._last_publish = now
+        try:
+            self.redis_storage.publish_progress(self.crawl_id, self.snapshot(status))
+        except Exception:
+            # Progress is best effort and must never fail the crawl itself
+            pass
+
+
+class ProgressHub:
+    """Fan progress messages out to local watchers from a single Redis subscription.
+
+    Each process holds one pub/sub connection no matter how many clients are
+    watching, and watchers only ever see the latest snapshot for their crawl,
+    so slow clients cannot build up a backlog.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self._watchers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._listen, name="progress-hub", daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(PROGRESS_CHANNEL)
+                for message in pubsub.listen():
+                    self._dispatch(message.get('data'))
+            except Exception:
+                time.sleep(1)
+
+    def _dispatch(self, data):
+        try:
+            progress = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            watchers = list(self._watchers.get(progress.get('crawl_id'), ()))
+        for watcher in watchers:
+            # Keep only the newest snapshot per watcher
+            try:
+                watcher.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                watcher.put_nowait(progress)
+            except queue.Full:
+                pass
+
+    def watch(self, crawl_id):
+        watcher = queue.Queue(maxsize=1)
+        with self._lock:
+            self._watchers.setdefault(crawl_id, set()).add(watcher)
+        return watcher
+
+    def unwatch(self, crawl_id, watcher):
+        with self._lock:
+            watchers = self._watchers.get(crawl_id)
+            if watchers:
+                watchers.discard(watcher)
+                if not watchers:
+                    del self._watchers[crawl_id]
@@ -0,0 +1,213 @@
+# rate_control.py
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+THROTTLE_STATUSES = (429, 503)
+
+# Rate limiters of the crawls running in this process, for the per-host gauges on /metrics
+_running_limiters = set()
+_running_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header as seconds to wait, or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class HostRateController:
+    """AIMD concurrency and pacing for a single host.
+
+    The concurrency limit grows by roughly one slot per round trip while
+    latency stays near its baseline, and is cut multiplicatively on 429/503,
+    timeouts or a latency spike. Requests are also spaced base_delay / limit
+    apart, never closer than min_interval (robots.txt Crawl-delay), and
+    nothing is sent before a Retry-After deadline, which is capped at
+    max_backoff. Setting the stopped event and calling wake() releases
+    every waiting acquire().
+    """
+
+    def __init__(self, base_delay=1.0, min_interval=0.0, min_limit=1, max_limit=8,
+                 increase=1.0, decrease=0.5, latency_factor=2.0, max_backoff=60.0, stopped=None):
+        self.base_delay = base_delay
+        self.min_interval = min_interval
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.max_backoff = max_backoff
+        self.stopped = stopped or threading.Event()
+        self.limit = float(min_limit)
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.latency_baseline = None
+        self.next_allowed_at = 0.0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failures = 0
+        self._cond = threading.Condition()
+
+    def _interval(self):
+        return max(self.base_delay / self.limit, self.min_interval)
+
+    def acquire(self):
+        """Block until a request to this host is allowed, then claim a slot.
+
+        Returns False, without a slot, if the crawl was stopped meanwhile.
+        """
+        with self._cond:
+            while True:
+                if self.stopped.is_set():
+                    return False
+                now = time.monotonic()
+                if self.in_flight < int(self.limit) and now >= self.next_allowed_at:
+                    break
+                wait = self.next_allowed_at - now if now < self.next_allowed_at else None
+                self._cond.wait(timeout=wait)
+            self.in_flight += 1
+            self.requests += 1
+            self.next_allowed_at = now + self._interval()
+            return True
+
+    def wake(self):
+        """Make waiting acquire() calls re-check, e.g. after the crawl was stopped"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, latency=None, status_code=None, retry_after=None, failed=False):
+        """Return the slot and adapt the limit to how the request went"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            throttled = status_code in THROTTLE_STATUSES
+
+            if failed or throttled:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self.consecutive_failures += 1
+                if throttled:
+                    self.throttled += 1
+                else:
+                    self.failures += 1
+                # A server asking for hours would otherwise park the crawl's workers
+                backoff = min(self.max_backoff, retry_after if retry_after is not None else
+                              self.base_delay * 2 ** self.consecutive_failures)
+                self.next_allowed_at = max(self.next_allowed_at, now + backoff)
+            elif latency is not None:
+                self.consecutive_failures = 0
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                if self.latency_baseline is None or latency < self.latency_baseline:
+                    self.latency_baseline = latency
+                else:
+                    # Let the baseline drift up slowly so one fast outlier does not pin it
+                    self.latency_baseline += 0.01 * (latency - self.latency_baseline)
+                if self.latency_ewma > self.latency_baseline * self.latency_factor:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                else:
+                    self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'interval': round(self._interval(), 3),
+                'latency_ewma': round(self.latency_ewma or 0, 3),
+                'latency_baseline': round(self.latency_baseline or 0, 3),
+                'backoff_remaining': round(max(self.next_allowed_at - time.monotonic(), 0), 2),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'failures': self.failures,
+            }
+
+
+class AdaptiveRateLimiter:
+    """Hand out one HostRateController per host"""
+
+    def __init__(self, base_delay=1.0, max_limit=8, min_interval_for=None, stopped=None):
+        self.base_delay = base_delay
+        self.max_limit = max_limit
+        self.min_interval_for = min_interval_for
+        # Shared with every controller, so stopping the crawl releases all waiting workers
+        self.stopped = stopped or threading.Event()
+        self._controllers = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            controller = self._controllers.get(host)
+        if controller is not None:
+            return controller
+
+        # Looking up the minimum interval may hit the network, so do it unlocked
+        min_interval = self.min_interval_for(url) if self.min_interval_for else 0
+        controller = HostRateController(
+            base_delay=self.base_delay,
+            min_interval=min_interval or 0,
+            max_limit=self.max_limit,
+            stopped=self.stopped,
+        )
+        with self._lock:
+            return self._controllers.setdefault(host, controller)
+
+    def wake(self):
+        """Release every acquire() waiting on a host, so they see the stopped event"""
+        with self._lock:
+            controllers = list(self._controllers.values())
+        for controller in controllers:
+            controller.wake()
+
+    def snapshot(self):
+        with self._lock:
+            controllers = dict(self._controllers)
+        return {host: controller.snapshot() for host, controller in controllers.items()}
+
+
+def track_limiter(limiter):
+    """Report limiter's hosts in busiest_hosts() until untrack_limiter() is called"""
+    with _running_lock:
+        _running_limiters.add(limiter)
+
+
+def untrack_limiter(limiter):
+    with _running_lock:
+        _running_limiters.discard(limiter)
+
+
+def busiest_hosts(top_n=20):
+    """Per-host limiter state summed over the running crawls, for the top_n hosts.
+
+    Hosts that were throttled or failed rank first, then those with the most
+    requests, so the number of series stays bounded however many hosts are crawled.
+    """
+    with _running_lock:
+        limiters = list(_running_limiters)
+    hosts = {}
+    for limiter in limiters:
+        for host, stats in limiter.snapshot().items():
+            entry = hosts.setdefault(host, {'limit': 0, 'in_flight': 0, 'backoff_remaining': 0,
+                                            'requests': 0, 'trouble': 0})
+            entry['limit'] += stats['limit']
+            entry['in_flight'] += stats['in_flight']
+            entry['backoff_remaining'] = max(entry['backoff_remaining'], stats['backoff_remaining'])
+            entry['requests'] += stats['requests']
+            entry['trouble'] += stats['throttled'] + stats['failures']
+    ranked = sorted(hosts.items(), key=lambda item: (item[1]['trouble'], item[1]['requests']), reverse=True)
+    return dict(ranked[:top_n])
@@ -0,0 +1,108 @@
+# reanalyze.py
+"""Re-run analyzers over a crawl's archived response bodies, without any network I/O.
+
+    python reanalyze.py <crawl_id> [--analyzers seo,links] [--workers 4] [--plugin my_analyzers]
+
+The crawl must have been run with an archive_dir (ARCHIVE_DIR for the web
+app). Pages without an archived body, such as failed fetches, are skipped.
+"""
+import argparse
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from analyzers import PageContext, resolve_analyzers, run_analyzers
+from archive import ResponseArchive
+from redis_storage import RedisStorage
+
+# Stored page fields a replay needs besides the body itself
+REPLAY_FIELDS = ['url', 'status_code', 'load_time', 'headers', 'archive', 'browser_timings']
+
+_archive = None
+
+
+def _init_worker(archive_dir, plugins):
+    global _archive
+    _archive = ResponseArchive(archive_dir)
+    for module in plugins:
+        importlib.import_module(module)
+
+
+def _replay_page(page, names):
+    """Analyze one archived page; return (fields, None) or (None, error message)"""
+    try:
+        body = _archive.load(page['archive'])
+        response = Response()
+        response._content = body
+        response.status_code = page['status_code']
+        response.headers = CaseInsensitiveDict(page['headers'])
+        response.encoding = page['archive'].get('encoding')
+        response.url = page['url']
+        soup = BeautifulSoup(response.text, 'html.parser')
+        context = PageContext(page['url'], response, body, soup, page['load_time'],
+                              page.get('browser_timings'))
+        return run_analyzers(context, names), None
+    except Exception as e:
+        return None, f"{page['url']}: {str(e)}"
+
+
+def reanalyze_crawl(redis_storage, archive_dir, crawl_id, analyzers=None, workers=None, plugins=(), batch_size=200):
+    """Replay every archived page of a crawl through the analyzers and store the new output"""
+    plugins = tuple(plugins)
+    for module in plugins:
+        importlib.import_module(module)
+    names = resolve_analyzers(analyzers)
+    workers = workers or os.cpu_count() or 1
+    total = redis_storage.count_pages(crawl_id)
+    result = {'pages': 0, 'skipped': 0, 'errors': []}
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(archive_dir, plugins)) as executor:
+        for start in range(0, total, batch_size):
+            pages = redis_storage.get_crawl_pages(crawl_id, start, start + batch_size - 1, fields=REPLAY_FIELDS)
+            archived = [(start + offset, page) for offset, page in enumerate(pages) if page.get('archive')]
+            result['skipped'] += len(pages) - len(archived)
+            chunksize = max(1, len(archived) // (4 * workers))
+            outcomes = executor.map(_replay_page, [page for _, page in archived],
+                                    [names] * len(archived), chunksize=chunksize)
+            updates = {}
+            for (index, _), (fields, error) in zip(archived, outcomes):
+                if error:
+                    result['errors'].append(error)
+                else:
+                    updates[index] = fields
+            redis_storage.store_analysis(crawl_id, updates)
+            result['pages'] += len(updates)
+
+    redis_storage.rebuild_stats(crawl_id)
+    result['seconds'] = round(time.perf_counter() - start_time, 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('crawl_id')
+    parser.add_argument('--analyzers', help='comma-separated analyzers to run (default: all)')
+    parser.add_argument('--archive-dir', default=os.getenv('ARCHIVE_DIR', 'archive'))
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--plugin', action='append', default=[],
+                        help='module to import for extra analyzers; may be repeated')
+    args = parser.parse_args(argv)
+
+    analyzers = [name for name in (args.analyzers or '').split(',') if name] or None
+    result = reanalyze_crawl(RedisStorage(), args.archive_dir, args.crawl_id, analyzers,
+                             workers=args.workers, plugins=args.plugin)
+    print(f"Re-analyzed {result['pages']} pages in {result['seconds']}s "
+          f"({result['skipped']} without an archived body, {len(result['errors'])} failed)")
+    for error in result['errors']:
+        print(f"  {error}")
+
+
+if __name__ == '__main__':
+    main()
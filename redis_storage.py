@@ -1,16 +1,197 @@
 # redis_storage.py
+import copy
+import itertools
 import redis
 import json
+import socket
+import uuid
+import threading
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from redis.exceptions import ConnectionError
 import time
+from progress import PROGRESS_CHANNEL
+from result_cache import INVALIDATION_CHANNEL
+from metrics import REDIS_SECONDS, REDIS_READS
+
+CRAWL_TTL = 86400 * 7  # 7 days
+
+# How each stored page field is decoded on the way out
+JSON_FIELDS = ['internal_links', 'external_links', 'top_words', 'meta_tags',
+               'headers', 'health_check', 'seo_metrics', 'social_links',
+               'performance_metrics', 'accessibility', 'technologies', 'security_headers', 'error',
+               'timings', 'profile', 'plugins', 'archive', 'browser_timings', 'assets', 'resource_weight']
+INT_FIELDS = ['status_code', 'content_length', 'images_found', 'depth',
+              'word_count', 'scripts', 'stylesheets', 'forms', 'h1_count']
+FLOAT_FIELDS = ['load_time', 'text_to_html_ratio']
+
+# Histogram bucket upper bounds for the per-crawl statistics
+LOAD_TIME_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10]
+CONTENT_LENGTH_BUCKETS = [10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000]
+
+# How many of the slowest profiled (page, stage) pairs and functions to keep per crawl
+PROFILE_TOP_N = 20
+
+# Replicas more than this many bytes of replication stream behind the master serve no reads
+REPLICA_MAX_LAG_BYTES = 1024 * 1024
+# Seconds between replica health checks
+REPLICA_CHECK_INTERVAL = 5
+
+
+def _connect(host, port):
+    return redis.Redis(
+        host=host,
+        port=port,
+        password=os.getenv('REDIS_PASSWORD', ''),
+        db=int(os.getenv('REDIS_DB', 0)),
+        decode_responses=True,
+        socket_timeout=2,
+        socket_connect_timeout=2,
+        retry_on_timeout=True,
+        health_check_interval=5
+    )
+
+
+class ReplicaPool:
+    """Read-only clients for the Redis replicas.
+
+    Reads are spread round-robin over the replicas whose link to the master
+    is up and whose replication offset is within max_lag_bytes of it. Health
+    is re-checked at most every check_interval seconds, by whichever request
+    asks for a client first, after resolving the replica host names again;
+    with no healthy replica, reads go to the master.
+    """
+
+    def __init__(self, master, clients, max_lag_bytes=REPLICA_MAX_LAG_BYTES,
+                 check_interval=REPLICA_CHECK_INTERVAL, hosts=()):
+        self.master = master
+        self.clients = list(clients)
+        # (host, port) names re-resolved on every check, so rescheduled replica tasks are picked up
+        self.hosts = list(hosts)
+        self._by_host = {}
+        self._unresolved = set()
+        self.max_lag_bytes = max_lag_bytes
+        self.check_interval = check_interval
+        self.healthy = []
+        self._checked_at = None
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, master):
+        """Clients for every address of the hosts in REDIS_REPLICA_HOSTS (or REDIS_SLAVE_HOST).
+
+        A swarm name like tasks.redis-slave resolves to each replica task,
+        so every replica gets its own client and health check.
+        """
+        entries = os.getenv('REDIS_REPLICA_HOSTS') or os.getenv('REDIS_SLAVE_HOST', '')
+        default_port = int(os.getenv('REDIS_PORT', 6379))
+        hosts = []
+        for entry in entries.split(','):
+            host, _, port = entry.strip().strip('"\'').partition(':')
+            if host:
+                hosts.append((host, int(port or default_port)))
+        pool = cls(master, [], hosts=hosts)
+        pool.resolve()
+        return pool
+
+    def resolve(self):
+        """Point the clients at the current addresses of the replica hosts.
+
+        Clients of addresses that are still there are kept; a host that does
+        not resolve keeps its previous clients.
+        """
+        if not self.hosts:
+            return
+        clients = []
+        for host, port in self.hosts:
+            previous = self._by_host.get((host, port), {})
+            try:
+                addresses = sorted({info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)})
+            except socket.gaierror:
+                if (host, port) not in self._unresolved:
+                    print(f"Could not resolve Redis replica {host}, keeping its previous addresses")
+                    self._unresolved.add((host, port))
+                clients.extend(previous.values())
+                continue
+            self._unresolved.discard((host, port))
+            if previous and set(addresses) != set(previous):
+                print(f"Redis replica {host} now resolves to {', '.join(addresses)}")
+            current = {address: previous.get(address) or _connect(address, port) for address in addresses}
+            self._by_host[(host, port)] = current
+            clients.extend(current.values())
+        self.clients = clients
+
+    def _in_sync(self, client, master_offset):
+        try:
+            info = client.info('replication')
+        except redis.exceptions.RedisError:
+            return False
+        if info.get('role') != 'slave' or info.get('master_link_status') != 'up' or info.get('master_sync_in_progress'):
+            return False
+        if master_offset is None:
+            return True
+        return master_offset - int(info.get('slave_repl_offset', 0)) <= self.max_lag_bytes
+
+    def check(self):
+        """Re-resolve the replica hosts and re-evaluate which replicas may serve reads"""
+        self.resolve()
+        if not self.clients:
+            self.healthy = []
+            self._checked_at = time.monotonic()
+            return
+        try:
+            master_offset = int(self.master.info('replication').get('master_repl_offset', 0))
+        except redis.exceptions.RedisError:
+            # Without the master's offset lag cannot be judged; keep the replicas that answer at all
+            master_offset = None
+        self.healthy = [client for client in self.clients if self._in_sync(client, master_offset)]
+        self._checked_at = time.monotonic()
+
+    def client(self):
+        """A replica client to read from, or None when no replica is usable"""
+        if not self.clients and not self.hosts:
+            return None
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            # One request re-checks while the others keep using the previous result
+            if self._lock.acquire(blocking=self._checked_at is None):
+                try:
+                    if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+                        self.check()
+                finally:
+                    self._lock.release()
+        healthy = self.healthy
+        return healthy[next(self._turn) % len(healthy)] if healthy else None
+
 
 class RedisStorage:
-    def __init__(self):
+    def __init__(self, redis_client=None, replicas=None):
         load_dotenv()
-        self.redis_client = self._get_redis_connection()
+        self.redis_client = redis_client or self._get_redis_connection()
+        if replicas is None:
+            replicas = ReplicaPool(self.redis_client, []) if redis_client else ReplicaPool.from_env(self.redis_client)
+        self.replicas = replicas
+        # Set on views returned by reader(): the storage whose client writes go to
+        self.primary = None
+        # Told about connection errors (the Redis supervisor's report_failure); reconnecting is its job
+        self.on_failure = None
+
+    def reader(self):
+        """A view of this storage whose reads go to a replica that is in sync.
+
+        Only for the read methods; returns self when no replica is usable.
+        A crawl whose summary has not replicated yet is looked up on the master.
+        """
+        client = self.replicas.client()
+        if client is None:
+            REDIS_READS.inc(target='master')
+            return self
+        REDIS_READS.inc(target='replica')
+        view = copy.copy(self)
+        view.redis_client = client
+        view.primary = self
+        return view
 
     def _get_redis_connection(self):
         """Get Redis connection with retry logic"""
@@ -20,6 +201,7 @@ class RedisStorage:
         
         redis_port = int(os.getenv('REDIS_PORT', default_port))
         
+        # Only masters: a replica would accept the connection but reject every write
         redis_hosts = [
             {
                 'host': os.getenv('REDIS_HOST', 'redis-master'),
@@ -28,10 +210,6 @@ class RedisStorage:
             {
                 'host': 'redis-master',
                 'port': default_port
-            },
-            {
-                'host': 'redis-slave',
-                'port': default_port
             }
         ]
 
@@ -39,17 +217,7 @@ class RedisStorage:
         for attempt in range(retry_count):
             for redis_config in redis_hosts:
                 try:
-                    client = redis.Redis(
-                        host=redis_config['host'],
-                        port=redis_config['port'],
-                        password=os.getenv('REDIS_PASSWORD', ''),
-                        db=int(os.getenv('REDIS_DB', 0)),
-                        decode_responses=True,
-                        socket_timeout=2,
-                        socket_connect_timeout=2,
-                        retry_on_timeout=True,
-                        health_check_interval=5
-                    )
+                    client = _connect(redis_config['host'], redis_config['port'])
                     # Test connection
                     client.ping()
                     print(f"Successfully connected to Redis at {redis_config['host']}:{redis_config['port']}")
@@ -66,147 +234,464 @@ class RedisStorage:
 
         raise ConnectionError(f"Could not connect to any Redis instance after {retry_count} attempts. Last error: {str(last_error)}")
 
-    def _ensure_connection(self):
-        """Ensure Redis connection is alive, reconnect if needed"""
-        try:
-            self.redis_client.ping()
-        except (ConnectionError, redis.exceptions.TimeoutError):
-            self.redis_client = self._get_redis_connection()
-            
-    def store_crawl_data(self, start_url, visited_pages):
-        """Store crawling results in Redis with duplicate prevention"""
-        self._ensure_connection()
+    def _connection_failed(self, error):
+        """Report a connection error on a request or crawl path instead of reconnecting inline"""
+        if self.on_failure is not None:
+            self.on_failure(error)
+
+    def _serialize_page(self, page):
+        """Flatten a page_info dict into Redis hash fields"""
+        fields = {
+            'url': page.get('url', ''),
+            'title': page.get('title', 'No title'),
+            'status_code': str(page.get('status_code', 0)),
+            'load_time': str(page.get('load_time', 0)),
+            'content_length': str(page.get('content_length', 0)),
+            'internal_links': json.dumps(page.get('internal_links', [])),
+            'external_links': json.dumps(page.get('external_links', [])),
+            'images_found': str(page.get('images_found', 0)),
+            'word_count': str(page.get('word_count', 0)),
+            'top_words': json.dumps(page.get('top_words', {})),
+            'meta_tags': json.dumps(page.get('meta_tags', {})),
+            'headers': json.dumps(page.get('headers', {})),
+            'timestamp': page.get('timestamp', datetime.now().isoformat()),
+            'health_check': json.dumps(page.get('health_check', {})),
+            'seo_metrics': json.dumps(page.get('seo_metrics', {})),
+            'social_links': json.dumps(page.get('social_links', {})),
+            'performance_metrics': json.dumps(page.get('performance_metrics', {})),
+            'accessibility': json.dumps(page.get('accessibility', {})),
+            'technologies': json.dumps(page.get('technologies', {})),
+            'security_headers': json.dumps(page.get('security_headers', {})),
+            'canonical_url': page.get('canonical_url', ''),
+            'content_fingerprint': page.get('content_fingerprint', ''),
+            'near_duplicate_of': page.get('near_duplicate_of', ''),
+            'depth': str(page.get('depth', 0)),
+            'error': json.dumps(page.get('error') or {}),
+            'timings': json.dumps(page.get('timings', {})),
+            'profile': json.dumps(page.get('profile') or {}),
+            'plugins': json.dumps(page.get('plugins', {})),
+            'archive': json.dumps(page.get('archive') or {}),
+            'rendered': str(bool(page.get('rendered'))),
+            'browser_timings': json.dumps(page.get('browser_timings') or {}),
+            'resource_weight': json.dumps(page.get('resource_weight') or {})
+        }
+        if page.get('assets'):
+            # Only crawls that measure resource weights record asset URLs
+            fields['assets'] = json.dumps(page['assets'])
+        return fields
+
+    def _bucket(self, value, bounds):
+        """Return the histogram bucket label for value"""
+        for bound in bounds:
+            if value <= bound:
+                return str(bound)
+        return '+Inf'
+
+    def _add_page_stats(self, pipe, crawl_id, page, stats_key=None):
+        """Queue incremental updates of the crawl-level statistics for one page"""
+        stats_key = stats_key or f"{crawl_id}:stats"
+        load_time = float(page.get('load_time', 0) or 0)
+        content_length = int(page.get('content_length', 0) or 0)
         
-        # Normalize URL for consistent comparison
-        normalized_url = start_url.rstrip('/')
+        pipe.hincrby(stats_key, 'pages', 1)
+        pipe.hincrby(stats_key, f"status:{page.get('status_code', 0)}", 1)
+        pipe.hincrbyfloat(stats_key, 'load_time_sum', load_time)
+        pipe.hincrby(stats_key, f"load_time_bucket:{self._bucket(load_time, LOAD_TIME_BUCKETS)}", 1)
+        pipe.hincrby(stats_key, 'content_length_sum', content_length)
+        pipe.hincrby(stats_key, f"content_length_bucket:{self._bucket(content_length, CONTENT_LENGTH_BUCKETS)}", 1)
         
-        # Check for existing crawl with same URL within last 24 hours
-        existing_crawls = self.redis_client.lrange("all_crawls", 0, -1)
-        current_time = datetime.now().timestamp()
+        for metric, present in page.get('seo_metrics', {}).items():
+            if not present:
+                pipe.hincrby(stats_key, f"seo_missing:{metric}", 1)
         
-        for crawl_id in existing_crawls:
-            if normalized_url in crawl_id:
-                summary = self.redis_client.hgetall(f"{crawl_id}:summary")
-                if summary:
-                    crawl_time = datetime.fromisoformat(summary['crawl_time']).timestamp()
-                    # If crawl exists within last 24 hours, return existing crawl_id
-                    if (current_time - crawl_time) < 86400:  # 24 hours in seconds
-                        return crawl_id
-
-        # If no recent duplicate found, create new crawl
-        timestamp = int(current_time)
-        crawl_id = f"crawl:{normalized_url}:{timestamp}"
+        accessibility = page.get('accessibility', {})
+        missing_alt = int(page.get('images_found', 0) or 0) - int(accessibility.get('images_with_alt', 0) or 0)
+        if missing_alt > 0:
+            pipe.hincrby(stats_key, 'a11y_missing:images_alt', missing_alt)
+        for check in ('skip_links', 'language_specified'):
+            if check in accessibility and not accessibility[check]:
+                pipe.hincrby(stats_key, f"a11y_missing:{check}", 1)
+        
+        for header, value in page.get('security_headers', {}).items():
+            if value == 'Not Set':
+                pipe.hincrby(stats_key, f"security_missing:{header}", 1)
         
-        if not visited_pages or not isinstance(visited_pages, list):
+        if page.get('error'):
+            pipe.hincrby(stats_key, f"error:{page['error']['type']}", 1)
+        
+        if page.get('near_duplicate_of'):
+            pipe.hincrby(stats_key, 'duplicates:near', 1)
+        
+        for tech in page.get('technologies', {}):
+            pipe.hincrby(stats_key, f"tech:{tech}", 1)
+        
+        if page.get('profile'):
+            self._add_page_profile(pipe, crawl_id, page['profile'])
+
+    def _add_page_profile(self, pipe, crawl_id, profile):
+        """Queue the aggregation of one sampled page profile into the crawl's profile"""
+        profile_key = f"{crawl_id}:profile"
+        pipe.hincrby(profile_key, 'pages', 1)
+        pipe.hincrbyfloat(profile_key, 'total_seconds', profile.get('total_seconds', 0))
+        for stage, entry in profile.get('stages', {}).items():
+            pipe.hincrbyfloat(profile_key, f"seconds:{stage}", entry['seconds'])
+            pipe.hincrby(profile_key, f"calls:{stage}", entry['calls'])
+            pipe.hincrby(profile_key, f"alloc:{stage}", entry['alloc_peak_bytes'])
+            offender = json.dumps({'url': profile['url'], 'stage': stage,
+                                   'seconds': entry['seconds'], 'alloc_peak_bytes': entry['alloc_peak_bytes']})
+            pipe.zadd(f"{profile_key}:slowest", {offender: entry['seconds']})
+        for function in profile.get('functions', []):
+            pipe.zincrby(f"{profile_key}:functions", function['cumulative_seconds'], function['function'])
+        pipe.zremrangebyrank(f"{profile_key}:slowest", 0, -PROFILE_TOP_N - 1)
+        for key in (profile_key, f"{profile_key}:slowest", f"{profile_key}:functions"):
+            pipe.expire(key, CRAWL_TTL)
+
+    def get_crawl_profile(self, crawl_id):
+        """Return the per-stage profile totals and top offenders, or None if nothing was sampled"""
+        profile_key = f"{crawl_id}:profile"
+        with self.redis_client.pipeline() as pipe:
+            pipe.hgetall(profile_key)
+            pipe.zrevrange(f"{profile_key}:slowest", 0, -1)
+            pipe.zrevrange(f"{profile_key}:functions", 0, PROFILE_TOP_N - 1, withscores=True)
+            with REDIS_SECONDS.time(operation='get_crawl_profile'):
+                raw, slowest, functions = pipe.execute()
+        pages = int(raw.pop('pages', 0))
+        if not pages:
             return None
+        total_seconds = float(raw.pop('total_seconds', 0))
+        
+        stages = {}
+        for field, value in raw.items():
+            metric, _, stage = field.partition(':')
+            stages.setdefault(stage, {})[metric] = float(value)
+        stage_rows = sorted((
+            {
+                'stage': stage,
+                'avg_ms': round(values.get('seconds', 0) * 1000 / pages, 3),
+                'share': round(values.get('seconds', 0) / total_seconds * 100, 1) if total_seconds else 0,
+                'calls': int(values.get('calls', 0)),
+                'avg_alloc_peak_kb': round(values.get('alloc', 0) / pages / 1024, 1),
+            }
+            for stage, values in stages.items()
+        ), key=lambda row: row['avg_ms'], reverse=True)
+        
+        return {
+            'pages': pages,
+            'avg_page_ms': round(total_seconds * 1000 / pages, 3),
+            'stages': stage_rows,
+            'slowest': [json.loads(entry) for entry in slowest],
+            'functions': [{'function': name, 'cumulative_seconds': round(seconds, 4)} for name, seconds in functions],
+        }
 
-        # Use pipeline for atomic operations
+    def store_resource_report(self, crawl_id, report):
+        """Save the crawl's sub-resource weight and caching report"""
         with self.redis_client.pipeline() as pipe:
+            pipe.set(f"{crawl_id}:resources", json.dumps(report), ex=CRAWL_TTL)
+            pipe.publish(INVALIDATION_CHANNEL, crawl_id)
+            pipe.execute()
+
+    def get_resource_report(self, crawl_id):
+        """Return the crawl's sub-resource report, or None if it was not measured"""
+        with REDIS_SECONDS.time(operation='get_resource_report'):
+            raw = self.redis_client.get(f"{crawl_id}:resources")
+        return json.loads(raw) if raw else None
+
+    def get_crawl_stats(self, crawl_id):
+        """Return the crawl-level statistics computed at ingest time"""
+        with REDIS_SECONDS.time(operation='get_crawl_stats'):
+            raw = self.redis_client.hgetall(f"{crawl_id}:stats")
+        pages = int(raw.pop('pages', 0))
+        load_time_sum = float(raw.pop('load_time_sum', 0))
+        content_length_sum = int(raw.pop('content_length_sum', 0))
+        
+        groups = {}
+        for field, value in raw.items():
+            group, _, name = field.partition(':')
+            groups.setdefault(group, {})[name] = int(value)
+        
+        def ordered_buckets(group, bounds):
+            counts = groups.get(group, {})
+            return {label: counts.get(label, 0) for label in [str(b) for b in bounds] + ['+Inf']}
+        
+        return {
+            'pages': pages,
+            'status_codes': groups.get('status', {}),
+            'avg_load_time': round(load_time_sum / pages, 3) if pages else 0,
+            'load_time_histogram': ordered_buckets('load_time_bucket', LOAD_TIME_BUCKETS),
+            'avg_content_length': content_length_sum // pages if pages else 0,
+            'content_length_histogram': ordered_buckets('content_length_bucket', CONTENT_LENGTH_BUCKETS),
+            'seo_missing': groups.get('seo_missing', {}),
+            'accessibility_missing': groups.get('a11y_missing', {}),
+            'security_missing': groups.get('security_missing', {}),
+            'technologies': groups.get('tech', {}),
+            'near_duplicates': groups.get('duplicates', {}).get('near', 0),
+            'errors': groups.get('error', {}),
+        }
+
+    def create_crawl(self, start_url):
+        """Register a new crawl up front so pages can be persisted as they complete"""
+        normalized_url = start_url.rstrip('/')
+        # The random suffix keeps crawls of the same site started within the same second apart
+        crawl_id = f"crawl:{normalized_url}:{int(datetime.now().timestamp())}:{uuid.uuid4().hex[:8]}"
+        
+        with self.redis_client.pipeline() as pipe:
+            pipe.hset(f"{crawl_id}:summary", mapping={
+                'pages_visited': 0,
+                'start_url': start_url,
+                'crawl_time': datetime.now().isoformat(),
+                'total_words': 0,
+                'total_images': 0,
+                'status': 'running',
+            })
+            pipe.expire(f"{crawl_id}:summary", CRAWL_TTL)
+            pipe.lpush("all_crawls", crawl_id)
             try:
-                # Store summary
-                summary = {
-                    'pages_visited': len(visited_pages),
-                    'start_url': start_url,
-                    'crawl_time': datetime.now().isoformat(),
-                    'total_words': sum(page.get('word_count', 0) for page in visited_pages),
-                    'total_images': sum(page.get('images_found', 0) for page in visited_pages),
-                }
-                
-                pipe.hset(f"{crawl_id}:summary", mapping=summary)
-                
-                # Store each page data
-                for index, page in enumerate(visited_pages):
-                    if not isinstance(page, dict):
-                        continue
-                    
-                    page_key = f"{crawl_id}:page:{index}"
-                    page_data = {
-                        'url': page.get('url', ''),
-                        'title': page.get('title', 'No title'),
-                        'status_code': str(page.get('status_code', 0)),
-                        'load_time': str(page.get('load_time', 0)),
-                        'content_length': str(page.get('content_length', 0)),
-                        'internal_links': json.dumps(page.get('internal_links', [])),
-                        'external_links': json.dumps(page.get('external_links', [])),
-                        'images_found': str(page.get('images_found', 0)),
-                        'word_count': str(page.get('word_count', 0)),
-                        'top_words': json.dumps(page.get('top_words', {})),
-                        'meta_tags': json.dumps(page.get('meta_tags', {})),
-                        'headers': json.dumps(page.get('headers', {})),
-                        'timestamp': page.get('timestamp', datetime.now().isoformat()),
-                        'health_check': json.dumps(page.get('health_check', {})),
-                        'seo_metrics': json.dumps(page.get('seo_metrics', {})),
-                        'social_links': json.dumps(page.get('social_links', {})),
-                        'performance_metrics': json.dumps(page.get('performance_metrics', {})),
-                        'accessibility': json.dumps(page.get('accessibility', {})),
-                        'technologies': json.dumps(page.get('technologies', {}))
-                    }
-                    
-                    pipe.hset(page_key, mapping=page_data)
-                    pipe.rpush(f"{crawl_id}:pages", page_key)
-                
-                # Add to crawls list and set expiration
-                pipe.lpush("all_crawls", crawl_id)
-                # Set TTL for all keys (optional, adjust expiration time as needed)
-                pipe.expire(f"{crawl_id}:summary", 86400 * 7)  # 7 days
-                pipe.expire(f"{crawl_id}:pages", 86400 * 7)  # 7 days
-                
                 pipe.execute()
-                return crawl_id
-                
-            except (ConnectionError, redis.exceptions.TimeoutError):
-                self.redis_client = self._get_redis_connection()
+            except (ConnectionError, redis.exceptions.TimeoutError) as e:
+                self._connection_failed(e)
                 raise
+        return crawl_id
 
-    def get_crawl_data(self, crawl_id):
-        """Retrieve crawling results from Redis"""
-        if not self.redis_client.exists(f"{crawl_id}:summary"):
+    def store_pages(self, crawl_id, start_index, pages):
+        """Persist a micro-batch of completed pages and update the running summary"""
+        if not pages:
+            return []
+        page_keys = [f"{crawl_id}:page:{start_index + offset}" for offset in range(len(pages))]
+        with self.redis_client.pipeline() as pipe:
+            try:
+                for page_key, page in zip(page_keys, pages):
+                    pipe.hset(page_key, mapping=self._serialize_page(page))
+                    pipe.expire(page_key, CRAWL_TTL)
+                    self._add_page_stats(pipe, crawl_id, page)
+                pipe.expire(f"{crawl_id}:stats", CRAWL_TTL)
+                pipe.rpush(f"{crawl_id}:pages", *page_keys)
+                pipe.expire(f"{crawl_id}:pages", CRAWL_TTL)
+                pipe.hincrby(f"{crawl_id}:summary", 'pages_visited', len(pages))
+                pipe.hincrby(f"{crawl_id}:summary", 'total_words',
+                             sum(int(page.get('word_count', 0)) for page in pages))
+                pipe.hincrby(f"{crawl_id}:summary", 'total_images',
+                             sum(int(page.get('images_found', 0)) for page in pages))
+                pipe.publish(INVALIDATION_CHANNEL, crawl_id)
+                with REDIS_SECONDS.time(operation='store_pages'):
+                    pipe.execute()
+                return page_keys
+            except (ConnectionError, redis.exceptions.TimeoutError) as e:
+                self._connection_failed(e)
+                raise
+
+    def update_pages(self, crawl_id, updates):
+        """Merge extra fields into already stored pages, keyed by page index"""
+        if not updates:
+            return
+        with self.redis_client.pipeline() as pipe:
+            for index, fields in updates.items():
+                pipe.hset(f"{crawl_id}:page:{index}", mapping={
+                    field: value if isinstance(value, str) else json.dumps(value)
+                    for field, value in fields.items()
+                })
+            pipe.publish(INVALIDATION_CHANNEL, crawl_id)
+            with REDIS_SECONDS.time(operation='update_pages'):
+                pipe.execute()
+
+    def store_analysis(self, crawl_id, updates):
+        """Overwrite the analyzer output of stored pages, keyed by page index"""
+        if not updates:
+            return
+        with self.redis_client.pipeline() as pipe:
+            for index, fields in updates.items():
+                serialized = self._serialize_page(fields)
+                pipe.hset(f"{crawl_id}:page:{index}", mapping={
+                    field: serialized[field] for field in fields if field in serialized
+                })
+            pipe.publish(INVALIDATION_CHANNEL, crawl_id)
+            with REDIS_SECONDS.time(operation='store_analysis'):
+                pipe.execute()
+
+    def rebuild_stats(self, crawl_id, chunk_size=500):
+        """Recompute the crawl-level statistics from the stored pages, e.g. after re-analysis"""
+        stats_key = f"{crawl_id}:stats"
+        building_key = f"{stats_key}:rebuild"
+        self.redis_client.delete(building_key)
+        total = self.count_pages(crawl_id)
+        for start in range(0, total, chunk_size):
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for page in self.get_crawl_pages(crawl_id, start, start + chunk_size - 1):
+                    # Profiles were aggregated when the pages were crawled
+                    page.pop('profile', None)
+                    self._add_page_stats(pipe, crawl_id, page, stats_key=building_key)
+                pipe.execute()
+        # Swap in the new totals at once so readers never see a half-built hash
+        if total and self.redis_client.exists(building_key):
+            self.redis_client.rename(building_key, stats_key)
+            self.redis_client.expire(stats_key, CRAWL_TTL)
+        else:
+            self.redis_client.delete(stats_key)
+        self.redis_client.publish(INVALIDATION_CHANNEL, crawl_id)
+
+    def save_checkpoint(self, crawl_id, frontier, visited, pages_stored):
+        """Persist the crawl frontier ([url, depth, hint] entries) and seen-set so the crawl can be resumed"""
+        checkpoint = {
+            'frontier': list(frontier),
+            'visited': list(visited),
+            'pages_stored': pages_stored,
+            'saved_at': datetime.now().isoformat(),
+        }
+        with REDIS_SECONDS.time(operation='save_checkpoint'):
+            self.redis_client.set(f"{crawl_id}:checkpoint", json.dumps(checkpoint), ex=CRAWL_TTL)
+
+    def load_checkpoint(self, crawl_id):
+        """Rebuild crawl state from the last checkpoint and the pages stored since.
+
+        Returns None unless the crawl exists, is not completed and has a checkpoint.
+        """
+        summary = self.redis_client.hgetall(f"{crawl_id}:summary")
+        if not summary or summary.get('status', 'completed') == 'completed':
             return None
         
-        # Get summary
-        summary = self.redis_client.hgetall(f"{crawl_id}:summary")
+        raw = self.redis_client.get(f"{crawl_id}:checkpoint")
+        if raw is None:
+            return None
+        checkpoint = json.loads(raw)
         
-        # Get all pages
-        pages = []
+        # Pages are written before the checkpoint that covers them, so anything
+        # past 'pages_stored' finished after the last checkpoint: treat those
+        # as visited and put their links back on the frontier.
         page_keys = self.redis_client.lrange(f"{crawl_id}:pages", 0, -1)
+        with self.redis_client.pipeline() as pipe:
+            for page_key in page_keys:
+                pipe.hmget(page_key, ['url', 'internal_links', 'depth'])
+            with REDIS_SECONDS.time(operation='load_checkpoint'):
+                rows = pipe.execute()
         
-        for page_key in page_keys:
-            page_data = self.redis_client.hgetall(page_key)
-            
-            # Convert stored strings back to original data types
-            for field in ['internal_links', 'external_links', 'top_words', 'meta_tags', 
-                         'headers', 'health_check', 'seo_metrics', 'social_links', 
-                         'performance_metrics', 'accessibility', 'technologies', 'security_headers']:
+        visited = set(checkpoint['visited'])
+        frontier = [tuple(entry) for entry in checkpoint['frontier']]
+        for index, (url, internal_links, depth) in enumerate(rows):
+            if url:
+                visited.add(url)
+            if index >= checkpoint['pages_stored'] and internal_links:
+                child_depth = int(depth or 0) + 1
+                frontier.extend((link, child_depth, None) for link in json.loads(internal_links))
+        
+        return {
+            'start_url': summary['start_url'],
+            'frontier': [entry for entry in frontier if entry[0] not in visited],
+            'visited': visited,
+            'pages_stored': len(page_keys),
+        }
+
+    def publish_progress(self, crawl_id, progress):
+        """Store the latest progress snapshot and broadcast it to live watchers"""
+        payload = json.dumps(progress)
+        with self.redis_client.pipeline() as pipe:
+            pipe.set(f"{crawl_id}:progress", payload, ex=CRAWL_TTL)
+            pipe.publish(PROGRESS_CHANNEL, payload)
+            with REDIS_SECONDS.time(operation='publish_progress'):
+                pipe.execute()
+
+    def get_progress(self, crawl_id):
+        """Return the last published progress snapshot for a crawl"""
+        raw = self.redis_client.get(f"{crawl_id}:progress")
+        return json.loads(raw) if raw else None
+
+    def finalize_crawl(self, crawl_id):
+        """Mark a crawl as completed and drop its checkpoint"""
+        with self.redis_client.pipeline() as pipe:
+            pipe.hset(f"{crawl_id}:summary", 'status', 'completed')
+            pipe.delete(f"{crawl_id}:checkpoint")
+            pipe.publish(INVALIDATION_CHANNEL, crawl_id)
+            pipe.execute()
+
+    def _decode_page(self, page_data, fields=None):
+        """Convert stored strings back to original data types.
+
+        With fields=None every known field is decoded (with defaults for
+        missing ones); otherwise only the projected fields are touched.
+        """
+        wanted = set(fields) if fields else None
+
+        def selected(field):
+            return wanted is None or field in wanted
+
+        for field in JSON_FIELDS:
+            if selected(field):
                 try:
-                    page_data[field] = json.loads(page_data.get(field, '{}'))
+                    page_data[field] = json.loads(page_data.get(field) or '{}')
                 except (json.JSONDecodeError, TypeError):
                     page_data[field] = {}
-            
-            # Convert numeric fields
-            for field in ['status_code', 'load_time', 'content_length', 'images_found', 
-                         'word_count', 'scripts', 'stylesheets', 'forms', 'h1_count']:
+        
+        for field in INT_FIELDS:
+            if selected(field):
                 try:
-                    page_data[field] = int(page_data.get(field, 0))
+                    page_data[field] = int(page_data.get(field) or 0)
                 except (ValueError, TypeError):
                     page_data[field] = 0
-            
-            # Convert float fields
-            page_data['text_to_html_ratio'] = float(page_data.get('text_to_html_ratio', 0))
-            
-            # Convert boolean fields
+        
+        for field in FLOAT_FIELDS:
+            if selected(field):
+                try:
+                    page_data[field] = float(page_data.get(field) or 0)
+                except (ValueError, TypeError):
+                    page_data[field] = 0.0
+        
+        if selected('responsive_meta'):
             page_data['responsive_meta'] = page_data.get('responsive_meta', 'False') == 'True'
-            
-            # Convert list fields
+
+        if selected('rendered'):
+            page_data['rendered'] = page_data.get('rendered', 'False') == 'True'
+        
+        if selected('languages'):
             try:
-                page_data['languages'] = json.loads(page_data.get('languages', '[]'))
+                page_data['languages'] = json.loads(page_data.get('languages') or '[]')
             except (json.JSONDecodeError, TypeError):
                 page_data['languages'] = []
-            
-            pages.append(page_data)
+        
+        return page_data
+
+    def get_crawl_summary(self, crawl_id):
+        """Return the summary hash of a crawl, or None if it does not exist"""
+        with REDIS_SECONDS.time(operation='get_crawl_summary'):
+            summary = self.redis_client.hgetall(f"{crawl_id}:summary") or None
+        if summary is None and self.primary is not None:
+            # A crawl registered moments ago may not have reached the replica yet
+            return self.primary.get_crawl_summary(crawl_id)
+        return summary
+
+    def count_pages(self, crawl_id):
+        """Return the number of stored pages for a crawl"""
+        return self.redis_client.llen(f"{crawl_id}:pages")
+
+    def get_crawl_pages(self, crawl_id, start=0, end=-1, fields=None):
+        """Retrieve a range of pages, fetching only the requested hash fields"""
+        with REDIS_SECONDS.time(operation='get_crawl_pages'):
+            page_keys = self.redis_client.lrange(f"{crawl_id}:pages", start, end)
+        if not page_keys:
+            return []
+        
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for page_key in page_keys:
+                if fields:
+                    pipe.hmget(page_key, fields)
+                else:
+                    pipe.hgetall(page_key)
+            with REDIS_SECONDS.time(operation='get_crawl_pages'):
+                rows = pipe.execute()
+        
+        pages = []
+        for row in rows:
+            if fields:
+                row = {field: value for field, value in zip(fields, row) if value is not None}
+            pages.append(self._decode_page(row, fields))
+        return pages
+
+    def get_crawl_data(self, crawl_id, start=0, end=-1):
+        """Retrieve crawling results from Redis"""
+        summary = self.get_crawl_summary(crawl_id)
+        if not summary:
+            return None
         
         return {
             'summary': summary,
-            'page_data': pages
+            'page_data': self.get_crawl_pages(crawl_id, start, end)
         }
 
     def delete_crawl_data(self, crawl_id):
@@ -219,8 +704,14 @@ class RedisStorage:
         # Remove pages list
         self.redis_client.delete(f"{crawl_id}:pages")
         
-        # Remove summary
+        # Remove summary and any pending checkpoint
         self.redis_client.delete(f"{crawl_id}:summary")
+        self.redis_client.delete(f"{crawl_id}:checkpoint")
+        self.redis_client.delete(f"{crawl_id}:progress")
+        self.redis_client.delete(f"{crawl_id}:stats")
+        self.redis_client.delete(f"{crawl_id}:resources")
+        self.redis_client.delete(f"{crawl_id}:profile", f"{crawl_id}:profile:slowest", f"{crawl_id}:profile:functions")
         
         # Remove from all_crawls list
         self.redis_client.lrem("all_crawls", 0, crawl_id)
+        self.redis_client.publish(INVALIDATION_CHANNEL, crawl_id)
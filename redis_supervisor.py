@@ -0,0 +1,82 @@
+# redis_supervisor.py
+import threading
+import time
+
+from redis.exceptions import RedisError
+
+CONNECTING = 'connecting'
+UP = 'up'
+DOWN = 'down'
+
+
+class RedisSupervisor:
+    """Connect to Redis and watch its health from a background thread.
+
+    Requests only read `state`, so an outage costs them a flag check
+    instead of the connect-and-failover loop. While connected the
+    supervisor pings every `interval` seconds (and refreshes the replica
+    health); while down it retries every `retry_interval` seconds.
+    """
+
+    def __init__(self, connect, on_connect=None, interval=2, retry_interval=1):
+        self.connect = connect
+        self.on_connect = on_connect
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.storage = None
+        self.state = CONNECTING
+        self.last_error = None
+        self.changed_at = time.monotonic()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="redis-supervisor", daemon=True)
+            self._thread.start()
+
+    def _set_state(self, state, error=None):
+        if state != self.state:
+            print(f"Redis is {state}" + (f": {error}" if error else ""))
+            self.state = state
+            self.changed_at = time.monotonic()
+        self.last_error = error
+
+    def report_failure(self, error):
+        """Called by a request that hit a Redis error: fail fast until the next successful check"""
+        self._set_state(DOWN, str(error))
+        self._wake.set()
+
+    def check(self):
+        """One supervision step: connect if needed, otherwise ping"""
+        if self.storage is None:
+            storage = self.connect()
+            if storage is None:
+                self._set_state(DOWN, 'could not connect')
+                return
+            self.storage = storage
+            if self.on_connect:
+                self.on_connect(storage)
+        try:
+            self.storage.redis_client.ping()
+            self.storage.replicas.check()
+        except RedisError as e:
+            self._set_state(DOWN, str(e))
+            return
+        self._set_state(UP)
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                self._set_state(DOWN, str(e))
+            self._wake.wait(self.interval if self.state == UP else self.retry_interval)
+            self._wake.clear()
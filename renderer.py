@@ -0,0 +1,204 @@
+# renderer.py
+import asyncio
+import os
+import re
+import threading
+import time
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:  # rendering is optional; JavaScript-built pages are then analyzed as fetched
+    async_playwright = None
+
+from analyzers import TECH_PATTERNS
+
+# Frameworks that build the page in the browser, and the empty elements they mount into
+SPA_MARKERS = re.compile('|'.join([
+    TECH_PATTERNS['react'], TECH_PATTERNS['angular'],
+    r'react(?:-dom)?\.development\.js', r'vue(?:\.runtime)?(?:\.global)?(?:\.prod)?(?:\.min)?\.js',
+    r'<app-root', r'\bng-version=', r'data-reactroot', r'__NUXT__',
+]), re.I)
+EMPTY_MOUNT = re.compile(
+    r'<(div|main)[^>]*\bid=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</\1>', re.I)
+INVISIBLE_TAGS = {'script', 'noscript', 'style', 'template'}
+
+# Sub-resources that never change the DOM the analyzers read
+BLOCKED_RESOURCES = ('image', 'font', 'media')
+
+# Runs before any page script, so the largest paint is recorded from the start
+LCP_OBSERVER = """
+window.__lcp = null;
+try {
+    new PerformanceObserver(list => {
+        for (const entry of list.getEntries()) window.__lcp = entry.renderTime || entry.loadTime || entry.startTime;
+    }).observe({type: 'largest-contentful-paint', buffered: true});
+} catch (e) {}
+"""
+
+TIMINGS_SCRIPT = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const paint = performance.getEntriesByName('first-contentful-paint')[0];
+    return {
+        ttfb: nav ? nav.responseStart : null,
+        dom_content_loaded: nav ? nav.domContentLoadedEventEnd : null,
+        load: nav ? nav.loadEventEnd : null,
+        first_contentful_paint: paint ? paint.startTime : null,
+        largest_contentful_paint: window.__lcp,
+    };
+}"""
+
+
+def _visible_words(soup):
+    root = soup.body or soup
+    return sum(len(text.split()) for text in root.find_all(string=True)
+               if text.parent.name not in INVISIBLE_TAGS)
+
+
+def needs_rendering(soup, html, min_words=50):
+    """Whether a fetched page is a JavaScript app shell: framework markers and next to no text"""
+    if not (SPA_MARKERS.search(html) or EMPTY_MOUNT.search(html)):
+        return False
+    return _visible_words(soup) < min_words
+
+
+class BrowserPool:
+    """Headless Chromium shared by every crawl in the process, for pages built by JavaScript.
+
+    Playwright runs on its own event-loop thread, started on the first
+    render; crawl workers hand it URLs through render(). At most
+    max_contexts pages render at once, each in a browser context that is
+    kept (with its page) for up to pages_per_context renders before it is
+    recycled. Images, fonts and media are never downloaded.
+    """
+
+    def __init__(self, max_contexts=2, pages_per_context=50, timeout=15, settle=1.0,
+                 blocked=BLOCKED_RESOURCES):
+        self.max_contexts = max_contexts
+        self.pages_per_context = pages_per_context
+        self.timeout = timeout
+        # Extra wait for the network to go quiet after the load event, for late XHR-built content
+        self.settle = settle
+        self.blocked = frozenset(blocked)
+        self._loop = None
+        self._playwright = None
+        self._browser = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return async_playwright is not None
+
+    def start(self):
+        """Launch the browser, if it is not running yet"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            if not self.available:
+                raise RuntimeError("Rendering needs playwright (pip install playwright && playwright install chromium)")
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True).start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._launch(), loop).result(timeout=60)
+            except Exception:
+                loop.call_soon_threadsafe(loop.stop)
+                raise
+            self._loop = loop
+
+    async def _launch(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        # One token per concurrent render; None until the slot first opens a context
+        self._slots = asyncio.Queue()
+        for _ in range(self.max_contexts):
+            self._slots.put_nowait(None)
+
+    def render(self, url):
+        """Load url in the browser and return {'html', 'status_code', 'timings', 'render_time'}.
+
+        Timings are the page's own navigation and paint entries, in seconds.
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._render(url), self._loop)
+        try:
+            # Includes the wait for a free context
+            return future.result(timeout=self.timeout * 4)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _open(self):
+        context = await self._browser.new_context()
+        await context.route('**/*', self._filter)
+        await context.add_init_script(LCP_OBSERVER)
+        return {'context': context, 'page': await context.new_page(), 'uses': 0}
+
+    async def _close(self, slot):
+        try:
+            await slot['context'].close()
+        except Exception:
+            pass
+
+    async def _filter(self, route):
+        if route.request.resource_type in self.blocked:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _render(self, url):
+        slot = await self._slots.get()
+        try:
+            if slot is not None and slot['uses'] >= self.pages_per_context:
+                await self._close(slot)
+                slot = None
+            if slot is None:
+                slot = await self._open()
+            slot['uses'] += 1
+            page = slot['page']
+            start = time.perf_counter()
+            response = await page.goto(url, wait_until='load', timeout=self.timeout * 1000)
+            try:
+                await page.wait_for_load_state('networkidle', timeout=self.settle * 1000)
+            except Exception:
+                pass  # pages that keep polling never go idle; render what is there
+            html = await page.content()
+            timings = await page.evaluate(TIMINGS_SCRIPT)
+            return {
+                'html': html,
+                'status_code': response.status if response else None,
+                'timings': {name: None if value is None else round(value / 1000, 4)
+                            for name, value in timings.items()},
+                'render_time': time.perf_counter() - start,
+            }
+        except BaseException:
+            # A failed or cancelled navigation can leave the page unusable; start the slot afresh
+            if slot is not None:
+                await self._close(slot)
+                slot = None
+            raise
+        finally:
+            self._slots.put_nowait(slot)
+
+    def close(self):
+        """Shut the browser down; the next render starts it again"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+
+    async def _shutdown(self):
+        while not self._slots.empty():
+            slot = self._slots.get_nowait()
+            if slot is not None:
+                await self._close(slot)
+        await self._browser.close()
+        await self._playwright.stop()
+
+
+# Shared by every crawler in the process, so the browser and its contexts are launched once
+shared_renderer = BrowserPool(max_contexts=int(os.getenv('RENDER_CONTEXTS', 2)))
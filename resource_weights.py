@@ -0,0 +1,264 @@
+# resource_weights.py
+"""Measure the real weight and caching of the scripts, stylesheets and images a crawl's pages load.
+
+    python resource_weights.py <crawl_id> [--workers 16] [--per-host 200]
+
+Every unique asset URL across the crawl is sampled once, with a HEAD
+request or, when that gives no size, a one-byte range request, so no asset
+is downloaded in full. Pages need the asset lists recorded by the
+performance analyzer.
+"""
+import argparse
+import email.utils
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from analyzers import ASSET_TYPES
+from redis_storage import RedisStorage
+
+# Cache lifetimes below this are reported as short for static assets
+SHORT_TTL = 7 * 24 * 3600
+COMPRESSIBLE = ('script', 'stylesheet')
+MIN_COMPRESS_BYTES = 1024
+# How many example URLs and pages the crawl report keeps per list
+REPORT_TOP_N = 20
+
+
+def _content_length(response):
+    """Full size of the resource: the Content-Range total for a range response, else Content-Length"""
+    content_range = response.headers.get('Content-Range', '')
+    total = content_range.rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else None
+
+
+def sample_resource(session, url, timeout=10):
+    """Status, size and caching headers of one asset, without downloading its body"""
+    response = session.head(url, timeout=timeout, allow_redirects=True)
+    size = _content_length(response) if response.ok else None
+    if size is None and response.status_code not in (404, 410):
+        # Many servers leave Content-Length off HEAD responses; a range request reports the total
+        response = session.get(url, timeout=timeout, headers={'Range': 'bytes=0-0'},
+                               stream=True, allow_redirects=True)
+        response.close()
+        size = _content_length(response) if response.ok else None
+    headers = response.headers
+    return {
+        'status_code': response.status_code,
+        'bytes': size,
+        'content_type': headers.get('Content-Type', ''),
+        'content_encoding': headers.get('Content-Encoding', ''),
+        'cache_control': headers.get('Cache-Control', ''),
+        'expires': headers.get('Expires', ''),
+        'date': headers.get('Date', ''),
+        'etag': 'ETag' in headers,
+        'last_modified': 'Last-Modified' in headers,
+    }
+
+
+def cache_lifetime(sample):
+    """Seconds a shared cache may reuse the asset, or None when the response doesn't say"""
+    directives = {}
+    for part in sample['cache_control'].split(','):
+        name, _, value = part.strip().partition('=')
+        directives[name.lower()] = value.strip('"')
+    if 'no-store' in directives or 'no-cache' in directives:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name, '').isdigit():
+            return int(directives[name])
+    if sample['expires']:
+        try:
+            expires = email.utils.parsedate_to_datetime(sample['expires'])
+            date = email.utils.parsedate_to_datetime(sample['date']) if sample['date'] else None
+        except (TypeError, ValueError):
+            return 0  # an invalid Expires means already expired
+        if date is None:
+            return max(int(expires.timestamp() - time.time()), 0)
+        return max(int((expires - date).total_seconds()), 0)
+    return None
+
+
+def cache_findings(kind, sample):
+    """Caching and compression problems of one sampled asset"""
+    findings = []
+    lifetime = cache_lifetime(sample)
+    if lifetime is None:
+        findings.append('no_cache_lifetime')
+    elif lifetime < SHORT_TTL:
+        findings.append('short_cache_lifetime')
+    if not sample['etag'] and not sample['last_modified']:
+        findings.append('no_validator')
+    if (kind in COMPRESSIBLE and not sample['content_encoding']
+            and (sample['bytes'] or 0) >= MIN_COMPRESS_BYTES):
+        findings.append('uncompressed')
+    return findings
+
+
+class ResourceSampler:
+    """Sample many asset URLs concurrently over one pooled session, within a per-host budget.
+
+    At most per_host assets of any one host are sampled (the rest are
+    reported as skipped) and at most host_concurrency requests run against
+    a host at once, so pages full of CDN images don't hammer the CDN.
+    """
+
+    def __init__(self, session=None, max_workers=16, per_host=200, host_concurrency=4, timeout=10):
+        self.session = session or requests.Session()
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.host_concurrency = host_concurrency
+        self.timeout = timeout
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return self._host_slots[host]
+
+    def _sample(self, url, kind):
+        with self._slot(urlparse(url).netloc):
+            try:
+                sample = sample_resource(self.session, url, self.timeout)
+            except requests.RequestException as e:
+                return {'error': str(e)}
+        if sample['status_code'] >= 400:
+            sample['error'] = f"HTTP {sample['status_code']}"
+        else:
+            sample['findings'] = cache_findings(kind, sample)
+        return sample
+
+    def sample_all(self, assets):
+        """Sample {url: kind}; returns {url: sample}, with {'skipped': True} past a host's budget"""
+        budgets = Counter()
+        selected, samples = {}, {}
+        for url, kind in assets.items():
+            host = urlparse(url).netloc
+            budgets[host] += 1
+            if budgets[host] > self.per_host:
+                samples[url] = {'skipped': True}
+            else:
+                selected[url] = kind
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for url, sample in zip(selected, executor.map(self._sample, selected, selected.values())):
+                samples[url] = sample
+        return samples
+
+
+def _iter_page_assets(redis_storage, crawl_id, chunk_size):
+    """(page index, url, {kind: [asset urls]}) for every stored page"""
+    total = redis_storage.count_pages(crawl_id)
+    for start in range(0, total, chunk_size):
+        pages = redis_storage.get_crawl_pages(crawl_id, start, start + chunk_size - 1, fields=['url', 'assets'])
+        for offset, page in enumerate(pages):
+            yield start + offset, page.get('url', ''), page.get('assets') or {}
+
+
+def _percentile(values, q):
+    return values[min(int(len(values) * q / 100), len(values) - 1)] if values else None
+
+
+def measure_crawl_resources(redis_storage, crawl_id, sampler=None, chunk_size=500):
+    """Sample every unique asset of a crawl, store each page's weight and return the crawl's report.
+
+    Pages are read twice, so only the unique assets are held in memory.
+    """
+    sampler = sampler or ResourceSampler()
+    start_time = time.perf_counter()
+
+    assets = {}
+    for _, _, page_assets in _iter_page_assets(redis_storage, crawl_id, chunk_size):
+        for kind in ASSET_TYPES:
+            for url in page_assets.get(kind, []):
+                assets.setdefault(url, kind)
+    samples = sampler.sample_all(assets)
+
+    page_weights = []
+    updates = {}
+    for index, page_url, page_assets in _iter_page_assets(redis_storage, crawl_id, chunk_size):
+        weight = {kind: 0 for kind in ASSET_TYPES}
+        weight.update({'total': 0, 'requests': 0, 'unsized': 0, 'findings': Counter()})
+        for kind in ASSET_TYPES:
+            for url in page_assets.get(kind, []):
+                sample = samples[url]
+                weight['requests'] += 1
+                if sample.get('bytes') is None:
+                    weight['unsized'] += 1
+                else:
+                    weight[kind] += sample['bytes']
+                    weight['total'] += sample['bytes']
+                weight['findings'].update(sample.get('findings', ['unreachable'] if 'error' in sample else []))
+        if weight['requests']:
+            weight['findings'] = dict(weight['findings'])
+            updates[index] = {'resource_weight': weight}
+            page_weights.append((weight['total'], page_url))
+        if len(updates) >= chunk_size:
+            redis_storage.update_pages(crawl_id, updates)
+            updates = {}
+    redis_storage.update_pages(crawl_id, updates)
+
+    sized = [(sample['bytes'], url) for url, sample in samples.items() if sample.get('bytes') is not None]
+    bytes_by_kind = Counter()
+    for size, url in sized:
+        bytes_by_kind[assets[url]] += size
+    findings = {}
+    for url, sample in samples.items():
+        for finding in sample.get('findings', []):
+            findings.setdefault(finding, []).append(url)
+    totals = sorted(total for total, _ in page_weights)
+    report = {
+        'assets': {
+            'unique': len(samples),
+            'sized': len(sized),
+            'skipped': sum(1 for sample in samples.values() if sample.get('skipped')),
+            'failed': sum(1 for sample in samples.values() if 'error' in sample),
+        },
+        'bytes': {kind: bytes_by_kind[kind] for kind in ASSET_TYPES},
+        'page_weight': {
+            'pages': len(totals),
+            'p50': _percentile(totals, 50),
+            'p95': _percentile(totals, 95),
+            'max': totals[-1] if totals else None,
+        },
+        'heaviest_pages': [{'url': url, 'bytes': total}
+                           for total, url in sorted(page_weights, reverse=True)[:REPORT_TOP_N]],
+        'largest_assets': [{'url': url, 'kind': assets[url], 'bytes': size}
+                           for size, url in sorted(sized, reverse=True)[:REPORT_TOP_N]],
+        'findings': {finding: {'count': len(urls), 'urls': sorted(urls)[:REPORT_TOP_N]}
+                     for finding, urls in sorted(findings.items())},
+        'seconds': round(time.perf_counter() - start_time, 2),
+    }
+    redis_storage.store_resource_report(crawl_id, report)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('crawl_id')
+    parser.add_argument('--workers', type=int, default=16, help='concurrent requests in total')
+    parser.add_argument('--per-host', type=int, default=200, help='assets sampled per host at most')
+    parser.add_argument('--host-concurrency', type=int, default=4, help='concurrent requests per host')
+    args = parser.parse_args(argv)
+
+    sampler = ResourceSampler(max_workers=args.workers, per_host=args.per_host,
+                              host_concurrency=args.host_concurrency)
+    report = measure_crawl_resources(RedisStorage(), args.crawl_id, sampler)
+    assets = report['assets']
+    print(f"Sampled {assets['unique']} assets in {report['seconds']}s "
+          f"({assets['sized']} sized, {assets['skipped']} over the per-host budget, {assets['failed']} failed)")
+    print(f"Page weight p50 {report['page_weight']['p50']} B, p95 {report['page_weight']['p95']} B")
+    for finding, entry in report['findings'].items():
+        print(f"  {finding}: {entry['count']} assets")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# result_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+INVALIDATION_CHANNEL = "crawl_invalidate"
+
+
+class ResultCache:
+    """In-process LRU cache of decoded crawl results and rendered views, bounded by total bytes.
+
+    Entries are grouped by crawl ID. Every write to a crawl publishes its ID
+    on INVALIDATION_CHANNEL, and each process drops that crawl's entries and
+    bumps its local version when the message arrives. A fill records the
+    version before reading Redis and is discarded if the version moved in
+    the meantime, so a fill racing an invalidation never caches stale data.
+    Entries also expire after ttl seconds in case a message is missed.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300, settle=5):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Seconds after an invalidation during which fills should read the master
+        self.settle = settle
+        self.size = 0
+        self._entries = OrderedDict()  # (crawl_id, key) -> (value, size, expires_at)
+        self._keys = {}  # crawl_id -> set of keys
+        self._versions = {}  # crawl_id -> (version, invalidated_at)
+        self._generation = 0  # bumped by clear()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self, crawl_id, key):
+        with self._lock:
+            entry = self._entries.get((crawl_id, key))
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                self._remove((crawl_id, key))
+                return None
+            self._entries.move_to_end((crawl_id, key))
+            return entry[0]
+
+    def version(self, crawl_id):
+        """Token to pass to put() for a fill that starts now"""
+        with self._lock:
+            return self._generation, self._versions.get(crawl_id, (0, None))[0]
+
+    def settling(self, crawl_id):
+        """Whether the crawl changed so recently that replicas may still serve the old data"""
+        with self._lock:
+            invalidated_at = self._versions.get(crawl_id, (0, None))[1]
+        return invalidated_at is not None and time.monotonic() - invalidated_at < self.settle
+
+    def put(self, crawl_id, key, value, size, version):
+        """Cache value unless the crawl was invalidated since version was taken or it is too big"""
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if (self._generation, self._versions.get(crawl_id, (0, None))[0]) != version:
+                return False
+            if (crawl_id, key) in self._entries:
+                self._remove((crawl_id, key))
+            self._entries[(crawl_id, key)] = (value, size, time.monotonic() + self.ttl)
+            self._keys.setdefault(crawl_id, set()).add(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            return True
+
+    def invalidate(self, crawl_id):
+        now = time.monotonic()
+        with self._lock:
+            for key in list(self._keys.get(crawl_id, ())):
+                self._remove((crawl_id, key))
+            version = self._versions.get(crawl_id, (0, None))[0]
+            self._versions[crawl_id] = (version + 1, now)
+            if len(self._versions) > 10000:
+                # Versions only matter to fills in flight, which finish long before the TTL
+                self._versions = {
+                    other: entry for other, entry in self._versions.items() if now - entry[1] < self.ttl
+                }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self.size = 0
+            self._generation += 1
+
+    def _remove(self, entry_key):
+        _, size, _ = self._entries.pop(entry_key)
+        self.size -= size
+        crawl_id, key = entry_key
+        keys = self._keys.get(crawl_id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._keys[crawl_id]
+
+    def start(self, redis_client):
+        """Listen for invalidations on a background thread"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._listen, args=(redis_client,),
+                                            name="result-cache", daemon=True)
+            self._thread.start()
+
+    def _listen(self, redis_client):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations may have been missed while not subscribed
+                self.clear()
+                for message in pubsub.listen():
+                    if message.get('data'):
+                        self.invalidate(message['data'])
+            except Exception:
+                time.sleep(1)
@@ -0,0 +1,143 @@
+# site_discovery.py
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+ALLOW_ALL = ""
+DISALLOW_ALL = "User-agent: *\nDisallow: /\n"
+
+
+class RobotsCache:
+    """Per-host robots.txt rules, fetched once and shared across replicas through Redis"""
+
+    def __init__(self, redis_client, session, user_agent='*', ttl=3600, error_ttl=300):
+        self.redis_client = redis_client
+        self.session = session
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._parsers = {}
+        self._lock = threading.Lock()
+
+    def _origin(self, url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _fetch(self, origin):
+        """Download robots.txt and return (rules, ttl) following RFC 9309 status handling"""
+        try:
+            response = self.session.get(f"{origin}/robots.txt", timeout=10)
+        except Exception:
+            return DISALLOW_ALL, self.error_ttl
+        if response.status_code >= 500:
+            return DISALLOW_ALL, self.error_ttl
+        if response.status_code >= 400:
+            return ALLOW_ALL, self.ttl
+        return response.text, self.ttl
+
+    def _get_parser(self, url):
+        origin = self._origin(url)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._parsers.get(origin)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        key = f"robots:{origin}"
+        rules = None
+        ttl = self.ttl
+        try:
+            rules = self.redis_client.get(key)
+            if rules is not None:
+                ttl = max(self.redis_client.ttl(key), 1)
+        except Exception:
+            pass
+        if rules is None:
+            rules, ttl = self._fetch(origin)
+            try:
+                self.redis_client.set(key, rules, ex=ttl)
+            except Exception:
+                pass
+
+        parser = RobotFileParser()
+        parser.parse(rules.splitlines())
+        with self._lock:
+            self._parsers[origin] = (parser, now + ttl)
+        return parser
+
+    def allowed(self, url):
+        return self._get_parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        return self._get_parser(url).crawl_delay(self.user_agent)
+
+    def sitemaps(self, url):
+        """Sitemaps declared in robots.txt, falling back to /sitemap.xml"""
+        return self._get_parser(url).site_maps() or [urljoin(self._origin(url), '/sitemap.xml')]
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iter_body_chunks(response, chunk_size=64 * 1024):
+    """Yield body chunks, transparently gunzipping .xml.gz sitemaps on the fly"""
+    decompressor = None
+    for chunk in response.iter_content(chunk_size):
+        if decompressor is None:
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16) if chunk[:2] == b'\x1f\x8b' else False
+        yield decompressor.decompress(chunk) if decompressor else chunk
+
+
+def iter_sitemap_urls(session, sitemap_urls, max_urls=1000, max_sitemaps=50):
+    """Stream (url, priority) pairs from sitemaps and sitemap indexes.
+
+    Documents are parsed incrementally and elements are discarded as soon as
+    they are read, so memory stays flat regardless of sitemap size.
+    """
+    pending = list(sitemap_urls)
+    seen_sitemaps = set()
+    yielded = 0
+
+    while pending and yielded < max_urls and len(seen_sitemaps) < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen_sitemaps:
+            continue
+        seen_sitemaps.add(sitemap_url)
+
+        try:
+            with session.get(sitemap_url, timeout=10, stream=True) as response:
+                if response.status_code != 200:
+                    continue
+                parser = ET.XMLPullParser(events=('end',))
+                loc, priority = None, None
+                for chunk in _iter_body_chunks(response):
+                    parser.feed(chunk)
+                    for _, element in parser.read_events():
+                        name = _local_name(element.tag)
+                        if name == 'loc':
+                            loc = (element.text or '').strip()
+                        elif name == 'priority':
+                            try:
+                                priority = float(element.text)
+                            except (TypeError, ValueError):
+                                priority = None
+                        elif name == 'sitemap':
+                            if loc:
+                                pending.append(loc)
+                            loc, priority = None, None
+                            element.clear()
+                        elif name == 'url':
+                            if loc:
+                                yield loc, priority
+                                yielded += 1
+                                if yielded >= max_urls:
+                                    return
+                            loc, priority = None, None
+                            element.clear()
+        except Exception:
+            # A broken or unreachable sitemap only costs us its seeds
+            continue
@@ -1,13 +1,63 @@
 # website.py
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response
+import gzip
+import hashlib
+import json
+import os
+import queue
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from main import AdvancedWebCrawler
+from analyzers import resolve_analyzers
+from crawl_diff import compare_crawls
+from crawl_registry import InFlightCrawls
 from redis_storage import RedisStorage
+from renderer import shared_renderer
+from redis_supervisor import RedisSupervisor, DOWN
+from progress import ProgressHub
+from result_cache import ResultCache
+from metrics import REGISTRY
 from urllib.parse import quote, unquote
-from redis.exceptions import ConnectionError
+from redis.exceptions import ConnectionError, TimeoutError
+
+try:
+    import zstandard
+except ImportError:  # zstd responses are optional
+    zstandard = None
 
 app = Flask(__name__)
 redis_storage = None
+progress_hub = None
+
+# Background crawl jobs started through /api/crawl: crawl ID -> (crawler, future)
+crawl_executor = ThreadPoolExecutor(max_workers=int(os.getenv('CRAWL_JOB_WORKERS', 4)))
+# Raw response bodies are archived here for re-analysis when set
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR') or None
+# How long a synchronous /crawl waits for an identical crawl already running elsewhere
+ATTACH_TIMEOUT = int(os.getenv('CRAWL_ATTACH_TIMEOUT', 600))
+# Crawls reuse pages fetched by other crawls within this many seconds, unless refreshing (0: off)
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 600))
+# Progress streams each hold a gunicorn thread; beyond this many per worker they are turned away,
+# so half the threads stay free for page views and API calls
+MAX_PROGRESS_STREAMS = int(os.getenv('MAX_PROGRESS_STREAMS', max(int(os.getenv('GUNICORN_THREADS', 8)) // 2, 1)))
+progress_streams = threading.BoundedSemaphore(MAX_PROGRESS_STREAMS)
+# Streams end after this long without an update, or this long in total; EventSource clients reconnect
+PROGRESS_IDLE_TIMEOUT = int(os.getenv('PROGRESS_IDLE_TIMEOUT', 300))
+PROGRESS_MAX_SECONDS = int(os.getenv('PROGRESS_MAX_SECONDS', 3600))
+crawl_jobs = {}
+# Set on shutdown: no new crawl jobs, and /ready reports 503 so the proxy stops routing here
+draining = threading.Event()
+# When running crawls are stopped at a checkpoint, counted from SIGTERM (see begin_drain)
+drain_deadline = None
+# Crawls running inside synchronous /crawl requests, stopped along with the background jobs
+sync_crawlers = set()
+# Routes that never touch Redis and are served during an outage
+NO_REDIS_ENDPOINTS = {'static', 'index', 'healthz', 'ready'}
+# Decoded reports and rendered views of completed crawls
+result_cache = ResultCache(max_bytes=int(os.getenv('RESULT_CACHE_BYTES', 64 * 1024 * 1024)),
+                           ttl=int(os.getenv('RESULT_CACHE_TTL', 300)))
 
 def init_redis():
     try:
@@ -17,13 +67,95 @@ def init_redis():
         print("Make sure Redis is running and accessible")
         return None
 
+def on_redis_connect(storage):
+    global redis_storage
+    redis_storage = storage
+    # Crawl threads report connection errors too, so requests fail fast until the supervisor sees Redis back
+    storage.on_failure = redis_supervisor.report_failure
+    # Merge this replica's metrics into the cluster-wide totals
+    REGISTRY.start_flusher(storage.redis_client)
+    result_cache.start(storage.redis_client)
+
+redis_supervisor = RedisSupervisor(init_redis, on_connect=on_redis_connect)
+
+def start():
+    """Start connecting to Redis in the background; requests never wait for it"""
+    redis_supervisor.start()
+
+def begin_drain(timeout):
+    """Stop taking crawl jobs, and stop every crawl still running timeout seconds from now.
+
+    Called on SIGTERM, so crawls are checkpointed in time however long the
+    worker then spends finishing in-flight requests.
+    """
+    global drain_deadline
+    draining.set()
+    if drain_deadline is not None:
+        return
+    drain_deadline = time.monotonic() + timeout
+    timer = threading.Timer(timeout, stop_crawls)
+    timer.daemon = True
+    timer.start()
+
+def stop_crawls():
+    """Stop background jobs and synchronous crawls at a checkpoint for /resume"""
+    crawlers = [crawler for crawler, future in list(crawl_jobs.values()) if not future.done()]
+    crawlers.extend(list(sync_crawlers))
+    for crawler in crawlers:
+        crawler.stop()
+    if crawlers:
+        print(f"Stopping {len(crawlers)} crawls at a checkpoint: "
+              f"{', '.join(crawler.crawl_id or '?' for crawler in crawlers)}")
+
+def drain_crawl_jobs(timeout, stop_timeout=20):
+    """Let running crawl jobs finish within timeout; stop the rest at a checkpoint for /resume.
+
+    After begin_drain() the wait ends at its deadline instead, whichever comes first.
+    """
+    draining.set()
+    if drain_deadline is not None:
+        timeout = min(timeout, max(drain_deadline - time.monotonic(), 0))
+    jobs = list(crawl_jobs.values())
+    if not jobs:
+        return
+    print(f"Waiting up to {timeout:.0f}s for {len(jobs)} crawl jobs")
+    wait([future for _, future in jobs], timeout=timeout)
+    unfinished = [(crawler, future) for crawler, future in jobs if not future.done()]
+    if unfinished:
+        stop_crawls()
+        wait([future for _, future in unfinished], timeout=stop_timeout)
+    crawl_executor.shutdown(wait=False)
+
 @app.before_request
 def check_redis():
-    global redis_storage
-    if redis_storage is None:
-        redis_storage = init_redis()
-    if redis_storage is None:
-        return "Redis connection is not available", 503
+    """Turn requests that need Redis away at once while it is unavailable"""
+    if request.endpoint in NO_REDIS_ENDPOINTS:
+        return
+    if redis_storage is None and not redis_supervisor.started:
+        # Served without gunicorn's post_worker_init hook, e.g. by `flask run`
+        start()
+    if redis_storage is None or redis_supervisor.state == DOWN:
+        return redis_unavailable()
+
+def redis_unavailable():
+    message = "Redis connection is not available"
+    if request.path.startswith('/api/'):
+        return jsonify({'error': message}), 503, {'Retry-After': '5'}
+    return render_template('index.html', error=f"{message}, please try again shortly"), 503, {'Retry-After': '5'}
+
+@app.errorhandler(ConnectionError)
+@app.errorhandler(TimeoutError)
+def redis_failed(error):
+    """Redis failed mid-request: fail fast for everyone until the supervisor sees it back"""
+    redis_supervisor.report_failure(error)
+    return redis_unavailable()
+
+def get_progress_hub():
+    global progress_hub
+    if progress_hub is None:
+        progress_hub = ProgressHub(redis_storage.redis_client)
+        progress_hub.start()
+    return progress_hub
 
 URL_PATTERN = re.compile(
     r'^https?://'
@@ -36,6 +168,160 @@ URL_PATTERN = re.compile(
 def validate_url(url):
     return bool(URL_PATTERN.match(url))
 
+def claim_crawl(url, **params):
+    """Claim this crawl in the in-flight registry: (registry, key, token, running crawl ID).
+
+    token is set when the caller owns the crawl; otherwise the ID of the
+    identical crawl already running is returned, if there is one.
+    """
+    registry = InFlightCrawls(redis_storage.redis_client)
+    key = registry.key(url, **params)
+    token, running_id = registry.claim(key)
+    return registry, key, token, running_id
+
+def hold_crawl(registry, crawl_id):
+    """Lock a crawl ID for the lifetime of its job; returns the release function, or None if it is locked"""
+    if not registry.lock_crawl(crawl_id):
+        return None
+    return registry.hold(registry.crawl_key(crawl_id), crawl_id)
+
+def register_claimed(crawler, registry, key, token):
+    """Register the crawl, lock its ID and publish it under the claimed key; returns the release function"""
+    try:
+        crawl_id = crawler.register()
+    except Exception:
+        if token is not None:
+            registry.release(key, token)
+        raise
+    release_crawl = hold_crawl(registry, crawl_id) or (lambda: None)
+    if token is None:
+        return release_crawl
+    registry.assign(key, token, crawl_id)
+    release_key = registry.hold(key, crawl_id)
+
+    def release():
+        release_key()
+        release_crawl()
+    return release
+
+def job_finished(crawl_id, release):
+    """Done callback of a background crawl job: forget it, release its locks and report a failure"""
+    def finished(future):
+        crawl_jobs.pop(crawl_id, None)
+        release()
+        error = None if future.cancelled() else future.exception()
+        if error:
+            # The crawler has already published the 'failed' status to progress watchers
+            print(f"Crawl job {crawl_id} failed: {error!r}")
+    return finished
+
+def find_recent_crawl(url):
+    """Return the ID of the newest completed crawl of exactly this start URL that has data, if any"""
+    normalized_url = url.rstrip('/')
+    crawl_ids = redis_storage.redis_client.lrange("all_crawls", 0, -1)
+    with redis_storage.redis_client.pipeline(transaction=False) as pipe:
+        for crawl_id in crawl_ids:
+            pipe.hmget(f"{crawl_id}:summary", 'start_url', 'status')
+        summaries = pipe.execute()
+    for crawl_id, (start_url, status) in zip(crawl_ids, summaries):
+        if start_url is None or start_url.rstrip('/') != normalized_url:
+            continue
+        # Running or interrupted crawls only hold part of the result; they are attached to instead
+        if is_cacheable({'status': status or 'completed'}) and redis_storage.count_pages(crawl_id):
+            return crawl_id
+    return None
+
+def first_page_data(crawl_id, storage=None):
+    """Fetch the summary and only the first page, which is all the HTML views show"""
+    return (storage or redis_storage).get_crawl_data(crawl_id, 0, 0)
+
+def cache_reader(crawl_id):
+    """Storage to fill the result cache from: a replica, unless the crawl changed moments ago"""
+    return redis_storage if result_cache.settling(crawl_id) else redis_storage.reader()
+
+def is_cacheable(summary):
+    # Crawls stored in one go by older versions have no status and never change afterwards
+    return summary.get('status', 'completed') == 'completed'
+
+def load_report(crawl_id, storage=None):
+    """Summary, first page, stats, profile and resource report of a crawl, from the result cache when possible"""
+    report = result_cache.get(crawl_id, 'report')
+    if report is not None:
+        return report
+    version = result_cache.version(crawl_id)
+    storage = storage or cache_reader(crawl_id)
+    data = first_page_data(crawl_id, storage)
+    if not data or not data['page_data']:
+        return None
+    report = {
+        'summary': data['summary'],
+        'page': data['page_data'][0],
+        'stats': storage.get_crawl_stats(crawl_id),
+        'profile': storage.get_crawl_profile(crawl_id),
+        'resources': storage.get_resource_report(crawl_id),
+    }
+    if is_cacheable(report['summary']):
+        result_cache.put(crawl_id, 'report', report, len(json.dumps(report, default=str)), version)
+    return report
+
+def cache_view(crawl_id, key, body, summary, version):
+    """Pair a rendered body with its ETag, caching both once the crawl is complete"""
+    view = {'body': body, 'etag': hashlib.sha1(body).hexdigest()}
+    if is_cacheable(summary):
+        result_cache.put(crawl_id, key, view, len(body), version)
+    return view
+
+def view_response(view, response):
+    """Tag a response with the view's ETag and answer 304 when the client already has it"""
+    response.set_etag(view['etag'], weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def json_response(payload):
+    """Serialize payload as JSON, compressed with zstd or gzip when the client accepts it"""
+    return compressed_response(json.dumps(payload).encode('utf-8'))
+
+def compressed_response(body, content_type='application/json'):
+    """Send body compressed with zstd or gzip when the client accepts it"""
+    headers = {'Content-Type': content_type, 'Vary': 'Accept-Encoding'}
+    accepted = request.accept_encodings
+    if len(body) >= 1024:
+        if zstandard is not None and accepted['zstd']:
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            headers['Content-Encoding'] = 'zstd'
+        elif accepted['gzip']:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+    return Response(body, headers=headers)
+
+def parse_analyzers(value):
+    """Comma-separated analyzer names, or None (every analyzer) when empty"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if not names:
+        return None
+    resolve_analyzers(names)  # raises ValueError for unknown names
+    return names
+
+RENDER_UNAVAILABLE = "JavaScript rendering is not available on this server (playwright is not installed)"
+
+@app.context_processor
+def inject_features():
+    # Templates only offer options this server can honour
+    return {'render_available': shared_renderer.available}
+
+def crawl_params(form):
+    """Read crawler parameters from a submitted form"""
+    return {
+        'max_pages': int(form.get('max_pages', 5)),
+        'max_retries': int(form.get('max_retries', 2)),
+        'max_workers': int(form.get('max_workers', 3)),
+        'delay': float(form.get('delay', 1)),
+        'profile_sample_rate': float(form.get('profile_sample_rate', 0)),
+        'analyzers': parse_analyzers(form.get('analyzers', '')),
+        'render_js': form.get('render_js') == 'true',
+        'measure_resources': form.get('measure_resources') == 'true',
+    }
+
 @app.route('/', methods=['GET'])
 def index():
     return render_template('index.html')
@@ -52,46 +338,269 @@ def crawl():
         max_pages = int(request.form.get('max_pages', 5))
         max_retries = int(request.form.get('max_retries', 2))
         max_workers = int(request.form.get('max_workers', 3))
-        delay = int(request.form.get('delay', 1))
+        delay = float(request.form.get('delay', 1))
+        profile_sample_rate = float(request.form.get('profile_sample_rate', 0))
+        render_js = request.form.get('render_js') == 'true'
+        if render_js and not shared_renderer.available:
+            return render_template('index.html', error=RENDER_UNAVAILABLE), 400
+        measure_resources = request.form.get('measure_resources') == 'true'
         
         # Check for existing recent crawl if not forcing refresh
         if not force_refresh:
-            normalized_url = url.rstrip('/')
-            existing_crawls = redis_storage.redis_client.lrange("all_crawls", 0, -1)
-            for crawl_id in existing_crawls:
-                if normalized_url in crawl_id:
-                    data = redis_storage.get_crawl_data(crawl_id)
-                    if data and data['page_data']:
-                        return render_template('results.html', results=data['page_data'][0])
+            crawl_id = find_recent_crawl(url)
+            report = load_report(crawl_id) if crawl_id else None
+            if report:
+                return render_template('results.html', results=report['page'],
+                                       stats=report['stats'], profile=report['profile'],
+                                       resources=report['resources'])
         
+        # An identical crawl already running (here or on another replica) is waited for, not repeated
+        registry, key, token, running_id = claim_crawl(url, max_pages=max_pages, analyzers=None,
+                                                       render_js=render_js, measure_resources=measure_resources)
+        if running_id:
+            registry.wait_finished(key, running_id, ATTACH_TIMEOUT)
+            report = load_report(running_id, redis_storage)
+            if report and report['summary'].get('status') == 'completed':
+                return render_template('results.html', results=report['page'],
+                                       stats=report['stats'], profile=report['profile'],
+                                       resources=report['resources'])
+
         # Continue with new crawl if no existing data or force refresh
         crawler = AdvancedWebCrawler(url, 
                                    max_retries=max_retries, 
                                    delay=delay, 
-                                   max_workers=max_workers)
-        crawler.crawl(max_pages=max_pages)
-        
-        if not crawler.visited_pages or not isinstance(crawler.visited_pages, list):
-            return render_template('index.html', error="No data could be retrieved from the URL")
+                                   max_workers=max_workers,
+                                   profile_sample_rate=profile_sample_rate,
+                                   archive_dir=ARCHIVE_DIR,
+                                   page_cache_ttl=0 if force_refresh else PAGE_CACHE_TTL,
+                                   render_js=render_js,
+                                   measure_resources=measure_resources,
+                                   redis_storage=redis_storage)
+        release = register_claimed(crawler, registry, key, token)
+        sync_crawlers.add(crawler)
+        try:
+            # Pages are persisted to Redis as they complete
+            crawl_id = crawler.crawl(max_pages=max_pages)
+        finally:
+            sync_crawlers.discard(crawler)
+            release()
         
-        # Store results in Redis
-        crawl_id = crawler.save_results()
+        if not any(not page.get('error') for page in crawler.visited_pages):
+            reason = crawler.visited_pages[0]['error']['type'] if crawler.visited_pages else 'no response'
+            return render_template('index.html', error=f"No data could be retrieved from the URL ({reason})")
         
-        # Get the stored data back from Redis to ensure consistent format
-        data = redis_storage.get_crawl_data(crawl_id)
-        if not data or not data['page_data']:
+        # Get the stored data back from the master to ensure consistent format;
+        # this also warms the result cache for the crawl's history view
+        report = load_report(crawl_id, redis_storage)
+        if not report:
             return render_template('index.html', error="Error storing crawl results")
             
-        return render_template('results.html', results=data['page_data'][0])
+        return render_template('results.html', results=report['page'],
+                               stats=report['stats'], profile=report['profile'],
+                               resources=report['resources'])
     except Exception as e:
         return render_template('index.html', error=f"Error crawling URL: {str(e)}")
 
+@app.route('/api/crawl', methods=['POST'])
+def start_crawl_job():
+    """Start a crawl in the background and return where to watch its progress"""
+    url = request.form.get('url', '').strip()
+    if not url or not validate_url(url):
+        return jsonify({'error': 'Invalid URL format'}), 400
+
+    try:
+        params = crawl_params(request.form)
+    except ValueError:
+        return jsonify({'error': 'Invalid crawl parameters'}), 400
+    if params['render_js'] and not shared_renderer.available:
+        return jsonify({'error': RENDER_UNAVAILABLE}), 400
+
+    force_refresh = request.form.get('force_refresh') == 'true'
+    if not force_refresh:
+        crawl_id = find_recent_crawl(url)
+        if crawl_id:
+            return jsonify({
+                'crawl_id': crawl_id,
+                'status': 'completed',
+                'results_url': url_for('history_detail', crawl_id=quote(crawl_id, safe='')),
+            })
+
+    if draining.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
+    max_pages = params.pop('max_pages')
+    registry, key, token, running_id = claim_crawl(url, max_pages=max_pages,
+                                                   analyzers=params['analyzers'] and sorted(params['analyzers']),
+                                                   render_js=params['render_js'],
+                                                   measure_resources=params['measure_resources'])
+    if running_id:
+        # Attach to the identical crawl that is already running
+        crawl_id = running_id
+    else:
+        crawler = AdvancedWebCrawler(url, archive_dir=ARCHIVE_DIR, redis_storage=redis_storage,
+                                     page_cache_ttl=0 if force_refresh else PAGE_CACHE_TTL, **params)
+        release = register_claimed(crawler, registry, key, token)
+        crawl_id = crawler.crawl_id
+        future = crawl_executor.submit(crawler.crawl, max_pages=max_pages)
+        crawl_jobs[crawl_id] = (crawler, future)
+
+        future.add_done_callback(job_finished(crawl_id, release))
+
+    encoded_id = quote(crawl_id, safe='')
+    return jsonify({
+        'crawl_id': crawl_id,
+        'status': 'running',
+        'attached': bool(running_id),
+        'progress_url': url_for('crawl_progress', crawl_id=encoded_id),
+        'results_url': url_for('history_detail', crawl_id=encoded_id),
+    }), 202
+
+@app.route('/api/crawl/<path:crawl_id>', methods=['GET'])
+def crawl_results_api(crawl_id):
+    """Return a crawl summary and a page range as JSON.
+
+    Query parameters: fields (comma separated page fields to fetch),
+    start/limit (page range, default the first 100 pages).
+    """
+    decoded_id = unquote(crawl_id)
+    try:
+        start = max(int(request.args.get('start', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 100)), 0), 1000)
+    except ValueError:
+        return jsonify({'error': 'start and limit must be integers'}), 400
+    fields = [field for field in request.args.get('fields', '').split(',') if field] or None
+
+    key = ('api', start, limit, tuple(fields or ()))
+    view = result_cache.get(decoded_id, key)
+    if view is None:
+        version = result_cache.version(decoded_id)
+        reader = cache_reader(decoded_id)
+        summary = reader.get_crawl_summary(decoded_id)
+        if not summary:
+            return jsonify({'error': 'Crawl not found'}), 404
+        pages = reader.get_crawl_pages(decoded_id, start, start + limit - 1, fields) if limit else []
+        body = json.dumps({
+            'crawl_id': decoded_id,
+            'summary': summary,
+            'total_pages': reader.count_pages(decoded_id),
+            'stats': reader.get_crawl_stats(decoded_id),
+            'profile': reader.get_crawl_profile(decoded_id),
+            'start': start,
+            'pages': pages,
+        }).encode('utf-8')
+        view = cache_view(decoded_id, key, body, summary, version)
+    return view_response(view, compressed_response(view['body']))
+
+def crawl_comparison(args):
+    """Run the comparison requested by ?ids=<id>,<id>[,...]&limit=N; returns (result, error, status)"""
+    crawl_ids = [unquote(crawl_id) for crawl_id in args.get('ids', '').split(',') if crawl_id]
+    try:
+        limit = min(max(int(args.get('limit', 100)), 0), 1000)
+        return compare_crawls(redis_storage.reader(), crawl_ids, limit=limit), None, 200
+    except LookupError as e:
+        return None, str(e), 404
+    except ValueError as e:
+        return None, str(e), 400
+
+@app.route('/api/compare', methods=['GET'])
+def compare_api():
+    """Diff two or more crawls of the same site as JSON"""
+    result, error, status = crawl_comparison(request.args)
+    if error:
+        return jsonify({'error': error}), status
+    return json_response(result)
+
+@app.route('/compare')
+def compare_view():
+    result, error, _ = crawl_comparison(request.args)
+    if error:
+        return render_template('index.html', error=f"Cannot compare crawls: {error}")
+    return render_template('compare.html', comparison=result)
+
+@app.route('/progress/<path:crawl_id>')
+def crawl_progress(crawl_id):
+    """Stream live crawl progress as server-sent events"""
+    decoded_id = unquote(crawl_id)
+    if not progress_streams.acquire(blocking=False):
+        return jsonify({'error': 'Too many progress streams, please retry shortly'}), 503, {'Retry-After': '5'}
+    try:
+        hub = get_progress_hub()
+    except BaseException:
+        progress_streams.release()
+        raise
+    # Subscribe before reading the snapshot so no update falls in between
+    watcher = hub.watch(decoded_id)
+
+    def closed():
+        # Runs when the server closes the response, even if the stream never started
+        hub.unwatch(decoded_id, watcher)
+        progress_streams.release()
+
+    try:
+        snapshot = redis_storage.get_progress(decoded_id)
+        if snapshot is None and redis_storage.get_crawl_summary(decoded_id) is None:
+            closed()
+            return jsonify({'error': f"Unknown crawl: {decoded_id}"}), 404
+    except BaseException:
+        closed()
+        raise
+
+    def stream():
+        progress = snapshot
+        started = last_update = time.monotonic()
+        # Ends on shutdown, when the crawl goes quiet (e.g. it died while 'running')
+        # or after PROGRESS_MAX_SECONDS, so no stream holds a thread forever
+        while not draining.is_set():
+            now = time.monotonic()
+            if progress:
+                last_update = now
+                yield f"data: {json.dumps(progress)}\n\n"
+                if progress.get('status') != 'running':
+                    return
+            if now - last_update >= PROGRESS_IDLE_TIMEOUT or now - started >= PROGRESS_MAX_SECONDS:
+                return
+            try:
+                progress = watcher.get(timeout=15)
+            except queue.Empty:
+                progress = None
+                yield ": keep-alive\n\n"
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(closed)
+    return response
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and serving"""
+    return 'ok'
+
+@app.route('/ready')
+def ready():
+    """Readiness: the supervisor's last check found Redis up, and the worker is not draining"""
+    if draining.is_set():
+        return 'draining', 503
+    if redis_storage is None or redis_supervisor.state == DOWN:
+        return 'Redis connection is not available', 503
+    return 'ready'
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics summed over all replicas, or only this one with ?scope=local"""
+    if request.args.get('scope') == 'local':
+        body = REGISTRY.render()
+    else:
+        REGISTRY.flush_to_redis(redis_storage.redis_client)
+        body = REGISTRY.render_cluster(redis_storage.redis_client)
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 @app.route('/history')
 def history():
-    crawl_ids = redis_storage.redis_client.lrange("all_crawls", 0, -1)
+    reader = redis_storage.reader()
+    crawl_ids = reader.redis_client.lrange("all_crawls", 0, -1)
     crawls = []
     for crawl_id in crawl_ids:
-        summary = redis_storage.redis_client.hgetall(f"{crawl_id}:summary")
+        summary = reader.redis_client.hgetall(f"{crawl_id}:summary")
         if summary:
             crawls.append({
                 'id': quote(crawl_id, safe=''),  # URL-safe encoding
@@ -104,15 +613,67 @@ def history():
 @app.route('/history/<path:crawl_id>')
 def history_detail(crawl_id):
     decoded_id = unquote(crawl_id)  # URL-safe decoding
-    data = redis_storage.get_crawl_data(decoded_id)
-    if not data:
-        return redirect(url_for('history'))
-    return render_template('results.html', results=data['page_data'][0], history=True)
+    view = result_cache.get(decoded_id, 'history')
+    if view is None:
+        version = result_cache.version(decoded_id)
+        report = load_report(decoded_id)
+        if not report:
+            return redirect(url_for('history'))
+        body = render_template('results.html', results=report['page'], stats=report['stats'],
+                               profile=report['profile'], resources=report['resources'], history=True).encode('utf-8')
+        view = cache_view(decoded_id, 'history', body, report['summary'], version)
+    return view_response(view, Response(view['body'], mimetype='text/html'))
+
+@app.route('/resume/<path:crawl_id>', methods=['POST'])
+def resume_crawl(crawl_id):
+    """Continue an interrupted crawl from its checkpoint in the background"""
+    decoded_id = unquote(crawl_id)
+    try:
+        params = crawl_params(request.form)
+    except ValueError:
+        return jsonify({'error': 'Invalid crawl parameters'}), 400
+    if params['render_js'] and not shared_renderer.available:
+        return jsonify({'error': RENDER_UNAVAILABLE}), 400
+    if draining.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+    summary = redis_storage.get_crawl_summary(decoded_id)
+    if summary is None:
+        return jsonify({'error': f"No crawl found to resume: {decoded_id}"}), 404
+    if summary.get('status', 'completed') == 'completed':
+        return jsonify({'error': 'Crawl is already completed', 'crawl_id': decoded_id}), 409
+
+    # A crawl that is still running here or on another replica must not get a second crawler
+    registry = InFlightCrawls(redis_storage.redis_client)
+    release = None if decoded_id in crawl_jobs else hold_crawl(registry, decoded_id)
+    if release is None:
+        return jsonify({'error': 'Crawl is still running', 'crawl_id': decoded_id}), 409
+    if not redis_storage.redis_client.exists(f"{decoded_id}:checkpoint"):
+        # Failed before its first checkpoint: there is nothing to continue from
+        release()
+        return jsonify({'error': f"No checkpoint to resume from: {decoded_id}"}), 404
+
+    max_pages = params.pop('max_pages')
+    crawler = AdvancedWebCrawler(request.form.get('url', ''), archive_dir=ARCHIVE_DIR,
+                                 redis_storage=redis_storage, page_cache_ttl=PAGE_CACHE_TTL, **params)
+    future = crawl_executor.submit(crawler.crawl, max_pages=max_pages, resume_id=decoded_id)
+    crawl_jobs[decoded_id] = (crawler, future)
+
+    future.add_done_callback(job_finished(decoded_id, release))
+
+    encoded_id = quote(decoded_id, safe='')
+    return jsonify({
+        'crawl_id': decoded_id,
+        'status': 'running',
+        'progress_url': url_for('crawl_progress', crawl_id=encoded_id),
+        'results_url': url_for('history_detail', crawl_id=encoded_id),
+    }), 202
 
 @app.route('/delete/<path:crawl_id>')
 def delete_crawl(crawl_id):
     decoded_id = unquote(crawl_id)
     redis_storage.delete_crawl_data(decoded_id)
+    # Don't wait for the pub/sub round trip on the replica that did the delete
+    result_cache.invalidate(decoded_id)
     return redirect(url_for('history'))
 
 @app.route('/delete-multiple')
@@ -122,10 +683,9 @@ def delete_multiple():
         if crawl_id:
             decoded_id = unquote(crawl_id)
             redis_storage.delete_crawl_data(decoded_id)
+            result_cache.invalidate(decoded_id)
     return redirect(url_for('history'))
 
 if __name__ == '__main__':
-    redis_storage = init_redis()  # Initial connection attempt
-    if redis_storage is None:
-        print("Warning: Redis connection is not available. Some features may not work.")
+    start()
     app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file